@@ -0,0 +1,4 @@
+"""
+Weather Data Agent Benchmarks
+Replays recorded conversations through the agent loop against local stand-ins
+"""
@@ -0,0 +1,260 @@
+"""
+Benchmark Runner
+Replays recorded conversations through main's agent loop and reports
+p50/p95 latency per stage, throughput, and regressions against earlier runs
+
+Usage:
+    python -m benchmarks.run --iterations 5 --stations 200
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path to import main/config
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config import Config
+from main import run_agent_turn, execute_tool, format_tool_result, load_system_prompt
+from tools import bigquery_tool
+from tracing import tracer
+from benchmarks.stand_ins import ReplayLLMClient, LocalBigQueryClient
+from benchmarks.synthetic_gsod import generate_stations, generate_gsod
+
+BENCHMARK_DIR = Path(__file__).parent
+SCENARIOS_PATH = BENCHMARK_DIR / 'scenarios.json'
+HISTORY_PATH = BENCHMARK_DIR / 'results' / 'history.jsonl'
+
+# Bumped whenever the stand-ins change what a scenario actually executes, so
+# runs of a different workload are never used as a baseline. Version 1 runs
+# (before DATE_TRUNC grouping was fixed in the DuckDB stand-in) measured
+# daily rows for the weekly/monthly scenarios.
+WORKLOAD_VERSION = 2
+
+# Stages reported, in pipeline order; any extra stage a tool reports is appended
+STAGES = ['llm', 'sql_build', 'query', 'export', 'summarize', 'load', 'render', 'turn']
+
+
+def load_scenarios(path: Path = SCENARIOS_PATH, names: list = None) -> list:
+    """Load recorded conversations, optionally filtered by name"""
+    scenarios = json.loads(Path(path).read_text())["scenarios"]
+    if names:
+        scenarios = [s for s in scenarios if s["name"] in names]
+    return scenarios
+
+
+def run_benchmark(scenarios: list, iterations: int, verbose: bool = False) -> dict:
+    """
+    Replay every scenario `iterations` times
+
+    Returns:
+        dict: {"samples": {stage: [seconds, ...]}, "turns": int, "tool_calls": int, "wall_time": float}
+    """
+    samples = {}
+    counts = {"turns": 0, "tool_calls": 0}
+    system_prompt = load_system_prompt()
+
+    def record(stage, seconds):
+        samples.setdefault(stage, []).append(seconds)
+
+    def tool_runner(tool_name, tool_input):
+        result = execute_tool(tool_name, tool_input)
+        counts["tool_calls"] += 1
+        if not result["success"]:
+            print(f"  ! {tool_name} failed: {result['message']}", file=sys.stderr)
+        for stage, seconds in result.get("timings", {}).items():
+            record(stage, seconds)
+        return format_tool_result(result)
+
+    wall_start = time.perf_counter()
+    for _ in range(iterations):
+        for scenario in scenarios:
+            history = []
+            for turn in scenario["turns"]:
+                llm_client = ReplayLLMClient(turn["responses"], on_call=lambda s: record("llm", s))
+                output = io.StringIO()
+                turn_start = time.perf_counter()
+                with contextlib.redirect_stdout(sys.stdout if verbose else output):
+                    run_agent_turn(llm_client, history, turn["user"], system_prompt, tool_runner=tool_runner)
+                record("turn", time.perf_counter() - turn_start)
+                counts["turns"] += 1
+
+    return {"samples": samples, "wall_time": time.perf_counter() - wall_start, **counts}
+
+
+def summarize(run: dict) -> dict:
+    """Reduce raw samples to p50/p95 per stage plus throughput"""
+    stages = {}
+    for stage in STAGES + sorted(set(run["samples"]) - set(STAGES)):
+        values = run["samples"].get(stage)
+        if not values:
+            continue
+        p50, p95 = np.percentile(values, [50, 95])
+        stages[stage] = {"count": len(values), "p50_ms": p50 * 1000, "p95_ms": p95 * 1000}
+
+    wall_time = run["wall_time"] or float('nan')
+    return {
+        "stages": stages,
+        "throughput": {
+            "turns_per_sec": run["turns"] / wall_time,
+            "tool_calls_per_sec": run["tool_calls"] / wall_time,
+        },
+        "wall_time_sec": run["wall_time"],
+    }
+
+
+def current_commit() -> str:
+    """Short git SHA of HEAD, suffixed with '+dirty' for uncommitted changes"""
+    try:
+        sha = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCHMARK_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'], cwd=BENCHMARK_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+        return f"{sha}+dirty" if dirty else sha
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def load_history(path: Path = HISTORY_PATH) -> list:
+    """Read previous benchmark summaries (one JSON object per line)"""
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text().splitlines() if line.strip()]
+
+
+def find_baseline(history: list, commit: str, params: dict) -> dict:
+    """Most recent run with the same parameters, preferring a different commit"""
+    comparable = [h for h in history if h.get("params") == params]
+    other_commits = [h for h in comparable if h.get("commit") != commit]
+    candidates = other_commits or comparable
+    return candidates[-1] if candidates else None
+
+
+def compare(summary: dict, baseline: dict, threshold: float, noise_floor_ms: float) -> list:
+    """
+    Return (stage, baseline_p50, current_p50, ratio) for every stage whose p50
+    grew by more than `threshold` and by more than `noise_floor_ms`
+    """
+    regressions = []
+    for stage, stats in summary["stages"].items():
+        old = baseline["stages"].get(stage)
+        if not old or not old["p50_ms"]:
+            continue
+        ratio = stats["p50_ms"] / old["p50_ms"]
+        if ratio > 1 + threshold and stats["p50_ms"] - old["p50_ms"] > noise_floor_ms:
+            regressions.append((stage, old["p50_ms"], stats["p50_ms"], ratio))
+    return regressions
+
+
+def print_report(summary: dict, baseline: dict = None):
+    """Print a per-stage latency table"""
+    print(f"\n{'stage':<12}{'n':>7}{'p50 ms':>12}{'p95 ms':>12}{'base p50':>12}")
+    print("-" * 55)
+    for stage, stats in summary["stages"].items():
+        base = ""
+        if baseline and stage in baseline["stages"]:
+            base = f"{baseline['stages'][stage]['p50_ms']:.2f}"
+        print(f"{stage:<12}{stats['count']:>7}{stats['p50_ms']:>12.2f}{stats['p95_ms']:>12.2f}{base:>12}")
+    throughput = summary["throughput"]
+    print(f"\nThroughput: {throughput['turns_per_sec']:.2f} turns/s, "
+          f"{throughput['tool_calls_per_sec']:.2f} tool calls/s "
+          f"({summary['wall_time_sec']:.2f}s wall)")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the weather agent loop with local stand-ins")
+    parser.add_argument('--iterations', type=int, default=3, help="Times to replay each scenario")
+    parser.add_argument('--stations', type=int, default=200, help="Synthetic stations to generate")
+    parser.add_argument('--data-dir', type=Path, help="Use a Parquet dataset from benchmarks.synthetic_gsod instead of generating in memory")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for the synthetic dataset")
+    parser.add_argument('--scenario', action='append', help="Only run the named scenario (repeatable)")
+    parser.add_argument('--scenarios-file', type=Path, default=SCENARIOS_PATH)
+    parser.add_argument('--history', type=Path, default=HISTORY_PATH, help="JSONL file of previous runs")
+    parser.add_argument('--no-record', action='store_true', help="Don't append this run to the history")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Relative p50 slowdown that counts as a regression")
+    parser.add_argument('--noise-floor-ms', type=float, default=1.0, help="Ignore p50 slowdowns smaller than this")
+    parser.add_argument('--fail-on-regression', action='store_true', help="Exit non-zero if a regression is found")
+    parser.add_argument('--metrics-out', type=Path, help="Write Prometheus text metrics for the run to this file")
+    parser.add_argument('--verbose', action='store_true', help="Show the agent's console output")
+    args = parser.parse_args(argv)
+
+    scenarios = load_scenarios(args.scenarios_file, args.scenario)
+    if not scenarios:
+        print("No scenarios selected")
+        return 1
+
+    if args.data_dir:
+        print(f"Using Parquet dataset at {args.data_dir}...")
+        bigquery_tool.set_bigquery_client(LocalBigQueryClient.from_parquet(args.data_dir))
+    else:
+        # Local dataset: stations plus one year of daily rows per station
+        print(f"Generating synthetic GSOD data for {args.stations} stations (seed {args.seed})...")
+        stations = generate_stations(args.stations, seed=args.seed)
+        gsod = generate_gsod(stations, '2024-01-01', '2024-12-31', seed=args.seed)
+        bigquery_tool.set_bigquery_client(LocalBigQueryClient({
+            f"{Config.BIGQUERY_TABLE_PREFIX}2024": gsod,
+            'stations': stations,
+        }))
+
+    output_dir = Config.OUTPUT_DIR
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            Config.OUTPUT_DIR = Path(tmp)
+            print(f"Replaying {len(scenarios)} scenario(s) x {args.iterations} iteration(s)...")
+            tracer.reset()
+            run = run_benchmark(scenarios, args.iterations, verbose=args.verbose)
+    finally:
+        Config.OUTPUT_DIR = output_dir
+        bigquery_tool.set_bigquery_client(None)
+
+    summary = summarize(run)
+    params = {
+        "workload": WORKLOAD_VERSION,
+        "iterations": args.iterations,
+        "stations": args.stations,
+        "data_dir": str(args.data_dir) if args.data_dir else None,
+        "seed": args.seed,
+        "scenarios": [s["name"] for s in scenarios],
+    }
+    commit = current_commit()
+    baseline = find_baseline(load_history(args.history), commit, params)
+
+    print(f"\nCommit: {commit}" + (f" (baseline {baseline['commit']})" if baseline else " (no baseline)"))
+    print_report(summary, baseline)
+
+    regressions = compare(summary, baseline, args.threshold, args.noise_floor_ms) if baseline else []
+    if regressions:
+        print("\nRegressions:")
+        for stage, old, new, ratio in regressions:
+            print(f"  {stage}: {old:.2f}ms -> {new:.2f}ms ({ratio:.2f}x)")
+
+    if args.metrics_out:
+        tracer.write_metrics(args.metrics_out)
+
+    if not args.no_record:
+        args.history.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.history, 'a') as f:
+            f.write(json.dumps({
+                "commit": commit,
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "params": params,
+                **summary,
+            }) + "\n")
+
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
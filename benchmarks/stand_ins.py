@@ -0,0 +1,216 @@
+"""
+Benchmark Stand-ins
+Replayed LLM responses and a local DuckDB-backed BigQuery client
+"""
+
+import re
+import copy
+import sys
+import threading
+import uuid
+from pathlib import Path
+from typing import List, Dict
+
+try:
+    import duckdb
+except ImportError:  # pragma: no cover - optional benchmark dependency
+    duckdb = None
+
+# Add parent directory to path to import tracing
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from tracing import tracer
+
+
+class ReplayLLMClient:
+    """
+    Drop-in for LLMClient that returns recorded responses in order.
+
+    Each call to send_message pops the next recorded response, so a
+    conversation replays exactly the tool_use sequence it was recorded with.
+    """
+
+    provider = "replay"
+
+    def __init__(self, responses: List[Dict], on_call=None):
+        self.responses = list(responses)
+        self.on_call = on_call
+
+    def send_message(self, messages: List[Dict], system_prompt: str) -> Dict:
+        """Return the next recorded response"""
+        with tracer.span("llm.send_message", provider=self.provider, message_count=len(messages)) as span:
+            if not self.responses:
+                raise RuntimeError("Replay exhausted: conversation made more LLM calls than were recorded")
+            response = copy.deepcopy(self.responses.pop(0))
+            response.setdefault("provider", self.provider)
+            span.set_attribute("stop_reason", response["stop_reason"])
+        if self.on_call:
+            self.on_call(span.duration)
+        return response
+
+
+class LocalQueryJob:
+    """
+    Minimal QueryJob: the SQL runs on a worker thread as soon as the job is
+    created, done() polls it, cancel() interrupts DuckDB, result() waits
+    for it and to_dataframe() returns the rows
+    """
+
+    def __init__(self, client: 'LocalBigQueryClient', sql: str):
+        self.client = client
+        self.sql = sql
+        self.job_id = f"local_{uuid.uuid4().hex[:12]}"
+        self.cancelled = False
+        self._frame = None
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name=self.job_id, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            with self.client.lock:
+                if self.cancelled:
+                    raise RuntimeError(f"Job {self.job_id} was cancelled")
+                self.client.running_job = self
+                try:
+                    self._frame = self.client.connection.execute(self.sql).df()
+                finally:
+                    self.client.running_job = None
+        except Exception as e:
+            self._error = e
+
+    def done(self) -> bool:
+        return not self._thread.is_alive()
+
+    def cancel(self) -> bool:
+        self.cancelled = True
+        # One DuckDB connection runs one statement at a time; only interrupt it if it's ours
+        if self.client.running_job is self:
+            self.client.connection.interrupt()
+        return True
+
+    def result(self):
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self
+
+    def to_dataframe(self):
+        return self.result()._frame
+
+
+class LocalBigQueryClient:
+    """
+    Executes the agent's BigQuery SQL locally with DuckDB.
+
+    Tables are registered under their unqualified BigQuery names
+    (e.g. gsod2024, stations); backtick-quoted project.dataset.table
+    references and BigQuery-only syntax are translated before execution.
+    """
+
+    def __init__(self, tables: Dict[str, object]):
+        if duckdb is None:
+            raise ImportError("duckdb is required for the local BigQuery stand-in: pip install duckdb")
+        self.connection = duckdb.connect()
+        self.lock = threading.Lock()  # the connection runs one statement at a time
+        self.running_job = None
+        self.tables = []
+        for name, frame in tables.items():
+            self.connection.register(name, frame)
+            self.tables.append(name)
+
+    @classmethod
+    def from_parquet(cls, data_dir) -> 'LocalBigQueryClient':
+        """
+        Expose every table directory written by synthetic_gsod.write_parquet_dataset
+        (gsod2024/, stations/, ...) as a view over its Parquet files
+        """
+        client = cls({})
+        for table_dir in sorted(Path(data_dir).iterdir()):
+            if table_dir.is_dir() and any(table_dir.glob('*.parquet')):
+                client.connection.execute(
+                    f"CREATE VIEW {table_dir.name} AS SELECT * FROM read_parquet('{table_dir / '*.parquet'}')"
+                )
+                client.tables.append(table_dir.name)
+        return client
+
+    def query(self, sql: str, job_config=None) -> LocalQueryJob:
+        return LocalQueryJob(self, translate_sql(sql, self.tables))
+
+
+# An aggregated column in build_query's SQL: g.metric or NULLIF(g.metric, sentinel)
+_COLUMN = r"(?:NULLIF\([^()]+\)|[^ ,()]+)"
+
+# Seed for approximate-mode sampling, so every benchmark run sees the same sample
+SAMPLE_SEED = 42
+
+
+def _sample_value(prefix: str = "") -> str:
+    """Seeded stand-in for RAND(): a value in [0, 1) derived from the row's key columns"""
+    return f"(hash({prefix}stn, {prefix}wban, {prefix}date, {SAMPLE_SEED}) % 1000000) / 1000000.0"
+
+
+def translate_sql(sql: str, tables: List[str] = ()) -> str:
+    """Rewrite the BigQuery dialect used by build_query into DuckDB SQL"""
+    # `project.dataset.prefix*` -> UNION ALL of matching tables with a _TABLE_SUFFIX column
+    def expand_wildcard(match):
+        prefix = match.group(1)
+        parts = [
+            f"SELECT *, '{name[len(prefix):]}' AS _TABLE_SUFFIX FROM {name}"
+            for name in sorted(tables) if name.startswith(prefix)
+        ]
+        if not parts:
+            raise ValueError(f"No local tables match wildcard {prefix}*")
+        return "(" + " UNION ALL ".join(parts) + ")"
+
+    sql = re.sub(r"`[^`]*\.([A-Za-z0-9_]+)\*`", expand_wildcard, sql)
+    # `project.dataset.table` -> table
+    sql = re.sub(r"`[^`]*\.([A-Za-z0-9_]+)`", r"\1", sql)
+    # table g TABLESAMPLE SYSTEM (n PERCENT) -> seeded row sample of table. DuckDB's
+    # SYSTEM sample keeps whole 2048-row vectors at random, which on the small
+    # synthetic tables is often none of them.
+    sql = re.sub(
+        r"(\w+) (\w+) TABLESAMPLE SYSTEM \(([\d.]+) PERCENT\)",
+        lambda m: f"(SELECT * FROM {m.group(1)} WHERE {_sample_value()} < {float(m.group(3)) / 100}) {m.group(2)}",
+        sql
+    )
+    # APPROX_QUANTILES(expr, 100)[OFFSET(p)] -> approx_quantile(expr, p / 100)
+    sql = re.sub(
+        rf"APPROX_QUANTILES\(({_COLUMN}),\s*(\d+)\)\[OFFSET\((\d+)\)\]",
+        lambda m: f"approx_quantile({m.group(1)}, {int(m.group(3)) / int(m.group(2))})",
+        sql
+    )
+    # Exact nearest-rank quantile from build_query -> quantile_disc(expr, q)
+    sql = re.sub(
+        rf"ARRAY_AGG\(({_COLUMN}) IGNORE NULLS ORDER BY {_COLUMN}\)"
+        rf"\[SAFE_OFFSET\(CAST\(FLOOR\(\(COUNT\({_COLUMN}\) - 1\) \* ([\d.]+)\) AS INT64\)\)\]",
+        r"quantile_disc(\1, \2)",
+        sql
+    )
+    # RAND() -> the same seeded per-row value, so the row filter is repeatable too
+    sql = sql.replace("RAND()", _sample_value("g."))
+    # DATE_TRUNC(expr, PART) -> DATE_TRUNC('part', expr), kept as a DATE like BigQuery
+    sql = re.sub(
+        r"DATE_TRUNC\(([^,()]+),\s*(\w+)\)",
+        lambda m: f"CAST(DATE_TRUNC('{m.group(2).lower()}', {m.group(1).strip()}) AS DATE)",
+        sql
+    )
+    return _group_by_date_alias(sql)
+
+
+def _group_by_date_alias(sql: str) -> str:
+    """
+    Make GROUP BY date group by the truncated date
+
+    BigQuery resolves GROUP BY date to the SELECT alias (the DATE_TRUNC
+    expression); DuckDB resolves it to the source column, which turns
+    weekly/monthly aggregates back into one row per day. Substitute the
+    aliased expression explicitly.
+    """
+    alias = re.search(r"(CAST\(DATE_TRUNC\([^()]+\) AS DATE\)) as date\b", sql)
+    if not alias:
+        return sql
+    return re.sub(
+        r"GROUP BY ([^\n]*)",
+        lambda m: "GROUP BY " + re.sub(r"(?<![.\w])date\b", alias.group(1), m.group(1)),
+        sql
+    )
@@ -0,0 +1,220 @@
+"""
+Synthetic GSOD Data
+Generates gsod-shaped weather tables and a matching stations table
+
+Rows are produced in independent (year, station block) chunks, each seeded
+from (seed, year, block), so the output is identical for a given seed and
+chunk size no matter how large the dataset is or how it is consumed. That
+keeps memory flat from thousands to billions of rows.
+
+Usage:
+    python -m benchmarks.synthetic_gsod --stations 10000 --start 2020-01-01 --end 2024-12-31 --out data/gsod
+"""
+
+import argparse
+import numpy as np
+import pandas as pd
+from pathlib import Path
+import sys
+import time
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional benchmark dependency
+    pa = None
+    pq = None
+
+# Add parent directory to path to import tools
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from tools.bigquery_tool import VALID_METRICS
+from tools.result_schema import MISSING_SENTINELS
+
+# Share of stations per country (the real dataset is US-heavy) and latitude range
+COUNTRY_WEIGHTS = {'US': 0.4, 'CA': 0.1, 'GB': 0.1, 'DE': 0.1, 'FR': 0.1, 'AU': 0.1, 'JP': 0.1}
+COUNTRY_LATITUDES = {
+    'US': (25, 65), 'CA': (43, 70), 'GB': (50, 58), 'DE': (47, 55),
+    'FR': (43, 51), 'AU': (-40, -12), 'JP': (31, 45),
+}
+
+US_STATES = ['CA', 'TX', 'NY', 'FL', 'WA', 'IL', 'CO', 'AK', 'AZ', 'MA']
+
+# Default rows per generated chunk / Parquet file
+ROWS_PER_CHUNK = 5_000_000
+
+
+def generate_stations(n_stations: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Generate a stations table shaped like noaa_gsod.stations
+
+    Args:
+        n_stations: Number of stations
+        seed: Random seed
+
+    Returns:
+        pd.DataFrame: One row per station (usaf, wban, name, country, state, lat, lon, elev, begin, end)
+    """
+    rng = np.random.default_rng([seed, 0])
+    countries = rng.choice(list(COUNTRY_WEIGHTS), size=n_stations, p=list(COUNTRY_WEIGHTS.values()))
+    states = np.where(countries == 'US', rng.choice(US_STATES, size=n_stations), '')
+
+    lat_low = np.array([COUNTRY_LATITUDES[c][0] for c in COUNTRY_WEIGHTS])
+    lat_high = np.array([COUNTRY_LATITUDES[c][1] for c in COUNTRY_WEIGHTS])
+    country_idx = pd.Index(list(COUNTRY_WEIGHTS)).get_indexer(countries)
+    lat = rng.uniform(lat_low[country_idx], lat_high[country_idx])
+
+    ids = np.arange(n_stations)
+    return pd.DataFrame({
+        'usaf': (ids + 700000).astype(str),
+        'wban': '99999',
+        'name': np.char.add('SYNTHETIC STATION ', ids.astype(str)),
+        'country': countries,
+        'state': states,
+        'lat': np.round(lat, 3),
+        'lon': np.round(rng.uniform(-180, 180, n_stations), 3),
+        'elev': np.round(np.abs(rng.normal(300, 400, n_stations)), 1),
+        'begin': '19730101',
+        'end': '20241231',
+    })
+
+
+def _generate_block(stations: pd.DataFrame, dates: pd.DatetimeIndex, rng: np.random.Generator,
+                    missing_rate: float) -> pd.DataFrame:
+    """Generate one row per station per day for a block of stations"""
+    n_stations, n_days = len(stations), len(dates)
+    n_rows = n_stations * n_days
+
+    # Seasonal cycle from latitude: colder and more seasonal away from the
+    # equator, phase flipped in the southern hemisphere
+    lat = stations['lat'].to_numpy(dtype=float)
+    mean = np.repeat(80 - 0.6 * np.abs(lat) + rng.normal(0, 3, n_stations), n_days)
+    amplitude = np.repeat(0.45 * np.abs(lat), n_days)
+    phase = np.repeat(np.where(lat < 0, np.pi, 0.0), n_days)
+    day_of_year = np.tile(dates.dayofyear.to_numpy(), n_stations)
+    temp = mean + amplitude * np.sin(2 * np.pi * (day_of_year - 105) / 365.25 + phase) + rng.normal(0, 5, n_rows)
+    spread = np.abs(rng.normal(15, 4, n_rows))
+    prcp = np.where(rng.random(n_rows) < 0.3, rng.exponential(0.3, n_rows), 0.0)
+    snow = np.abs(rng.normal(3, 2, n_rows))
+
+    columns = {
+        'temp': temp,
+        'max': temp + spread / 2,
+        'min': temp - spread / 2,
+        'dewp': temp - np.abs(rng.normal(8, 4, n_rows)),
+        'slp': rng.normal(1015, 8, n_rows),
+        'wdsp': np.abs(rng.normal(7, 3, n_rows)),
+        # GSOD reports "no snow on the ground" as missing, not zero
+        'sndp': np.where(temp < 32, snow, MISSING_SENTINELS['sndp']),
+        'prcp': prcp,
+    }
+
+    df = pd.DataFrame({
+        'stn': np.repeat(stations['usaf'].to_numpy(), n_days),
+        'wban': np.repeat(stations['wban'].to_numpy(), n_days),
+        # datetime64 rather than datetime.date objects: 8 bytes per row, no Python objects
+        'date': np.tile(dates.values.astype('datetime64[D]'), n_stations),
+    })
+    for metric in VALID_METRICS:
+        values = np.round(columns[metric], 2 if metric == 'prcp' else 1)
+        df[metric] = np.where(rng.random(n_rows) < missing_rate, MISSING_SENTINELS[metric], values)
+
+    return df
+
+
+def iter_gsod_chunks(stations: pd.DataFrame, start_date: str, end_date: str, seed: int = 0,
+                     missing_rate: float = 0.02, rows_per_chunk: int = ROWS_PER_CHUNK):
+    """
+    Yield (year, block_index, DataFrame) chunks covering every station and day
+
+    Each chunk holds whole years for a block of stations and is seeded from
+    (seed, year, block_index), so chunks can be generated independently.
+    """
+    dates = pd.date_range(start_date, end_date, freq='D')
+    for year in sorted(set(dates.year)):
+        year_dates = dates[dates.year == year]
+        block_size = max(1, rows_per_chunk // len(year_dates))
+        for block_index, block_start in enumerate(range(0, len(stations), block_size)):
+            rng = np.random.default_rng([seed, int(year), block_index])
+            block = stations.iloc[block_start:block_start + block_size]
+            yield int(year), block_index, _generate_block(block, year_dates, rng, missing_rate)
+
+
+def generate_gsod(stations: pd.DataFrame, start_date: str, end_date: str, seed: int = 0,
+                  missing_rate: float = 0.02, rows_per_chunk: int = ROWS_PER_CHUNK) -> pd.DataFrame:
+    """
+    Generate one in-memory table with all VALID_METRICS for every station and day
+
+    Args:
+        stations: Stations table from generate_stations
+        start_date: First date (YYYY-MM-DD)
+        end_date: Last date (YYYY-MM-DD)
+        seed: Random seed
+        missing_rate: Fraction of values replaced with the GSOD missing sentinel
+        rows_per_chunk: Chunk size; must match write_parquet_dataset for identical output
+
+    Returns:
+        pd.DataFrame: gsod-shaped table (stn, wban, date, metrics...)
+    """
+    chunks = [df for _, _, df in iter_gsod_chunks(stations, start_date, end_date, seed, missing_rate, rows_per_chunk)]
+    return pd.concat(chunks, ignore_index=True)
+
+
+def write_parquet_dataset(output_dir, n_stations: int, start_date: str, end_date: str, seed: int = 0,
+                          missing_rate: float = 0.02, rows_per_chunk: int = ROWS_PER_CHUNK) -> dict:
+    """
+    Write a synthetic dataset as Parquet, partitioned like the yearly BigQuery tables
+
+    Layout:
+        <output_dir>/stations/stations.parquet
+        <output_dir>/gsod2023/part-00000.parquet
+        <output_dir>/gsod2024/part-00000.parquet, part-00001.parquet, ...
+
+    Returns:
+        dict: Summary with row counts and file counts
+    """
+    if pq is None:
+        raise ImportError("pyarrow is required to write Parquet: pip install pyarrow")
+
+    output_dir = Path(output_dir)
+    (output_dir / 'stations').mkdir(parents=True, exist_ok=True)
+    stations = generate_stations(n_stations, seed=seed)
+    pq.write_table(pa.Table.from_pandas(stations, preserve_index=False), output_dir / 'stations' / 'stations.parquet')
+
+    total_rows, files = 0, 0
+    for year, block_index, df in iter_gsod_chunks(stations, start_date, end_date, seed, missing_rate, rows_per_chunk):
+        table_dir = output_dir / f"gsod{year}"
+        table_dir.mkdir(exist_ok=True)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        # Store dates as DATE, like the BigQuery column, not as timestamps
+        table = table.set_column(table.schema.get_field_index('date'), 'date', table['date'].cast(pa.date32()))
+        pq.write_table(table, table_dir / f"part-{block_index:05d}.parquet")
+        total_rows += len(df)
+        files += 1
+
+    return {"stations": len(stations), "rows": total_rows, "files": files, "path": str(output_dir)}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Generate a synthetic GSOD dataset as partitioned Parquet")
+    parser.add_argument('--out', type=Path, required=True, help="Output directory")
+    parser.add_argument('--stations', type=int, default=1000, help="Number of stations")
+    parser.add_argument('--start', default='2024-01-01', help="First date (YYYY-MM-DD)")
+    parser.add_argument('--end', default='2024-12-31', help="Last date (YYYY-MM-DD)")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed")
+    parser.add_argument('--missing-rate', type=float, default=0.02, help="Fraction of values set to the missing sentinel")
+    parser.add_argument('--rows-per-file', type=int, default=ROWS_PER_CHUNK, help="Rows per Parquet file")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    summary = write_parquet_dataset(
+        args.out, args.stations, args.start, args.end,
+        seed=args.seed, missing_rate=args.missing_rate, rows_per_chunk=args.rows_per_file
+    )
+    elapsed = time.perf_counter() - start
+    print(f"Wrote {summary['rows']:,} rows for {summary['stations']:,} stations "
+          f"in {summary['files']} file(s) to {summary['path']} ({elapsed:.1f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
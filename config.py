@@ -50,15 +50,58 @@ class Config:
     # BigQuery Configuration
     BIGQUERY_PROJECT = 'bigquery-public-data'
     BIGQUERY_DATASET = 'noaa_gsod'
-    BIGQUERY_TABLE = 'gsod2024'
+    BIGQUERY_TABLE_PREFIX = 'gsod'  # one table per year: gsod1929 ... gsod<current year>
+    GSOD_FIRST_YEAR = 1929
 
     # Output Configuration
     OUTPUT_DIR = Path(__file__).parent / 'outputs'
     PROMPTS_DIR = Path(__file__).parent / 'prompts'
 
+    # Chart Rendering
+    CHART_DPI = 100
+    PNG_COMPRESS_LEVEL = 1  # zlib level 0-9; low favours render speed over file size
+    MAX_BAR_CATEGORIES = 30  # bar charts keep the top N categories, rest go to "Other"
+    MAX_BAR_TICKS = 50  # bar chart tick labels are thinned to at most this many
+
     # Query Limits (for POC)
     MAX_QUERY_ROWS = 10000
 
+    # Tool Result Summaries (sent to the LLM with each query result)
+    RESULT_SUMMARY_TOKENS = 600  # approximate token budget for one summary
+    RESULT_SAMPLE_ROWS = 3  # rows shown from the start and end of the result
+
+    # Plan Cache (replays tool calls for recurring question shapes)
+    PLAN_CACHE_ENABLED = os.getenv('PLAN_CACHE_ENABLED', 'false').lower() == 'true'
+    PLAN_CACHE_MIN_CONFIDENCE = 0.75  # with the defaults, a plan is replayed once seen twice
+    PLAN_CACHE_SIZE = 256  # question templates kept (least recently used are dropped)
+
+    # Query Jobs
+    QUERY_TIMEOUT_SECONDS = float(os.getenv('QUERY_TIMEOUT_SECONDS', 300))  # jobs past this are cancelled
+    QUERY_POLL_INITIAL_SECONDS = 0.01  # first job status poll; doubles up to the max
+    QUERY_POLL_MAX_SECONDS = 2.0
+    QUERY_JOB_HISTORY = 100  # finished jobs kept in the registry
+
+    # Request Scheduling (shared by LLM calls and BigQuery job submission)
+    # Per provider: sustained requests/second, burst size, concurrent requests
+    SCHEDULER_LIMITS = {
+        'anthropic': {'rate': 1.0, 'burst': 5, 'max_concurrent': 4},
+        'gemini': {'rate': 1.0, 'burst': 5, 'max_concurrent': 4},
+        'bigquery': {'rate': 10.0, 'burst': 20, 'max_concurrent': 10},
+    }
+    SCHEDULER_MAX_QUEUED = 16  # callers waiting for a slot before new ones are turned away
+    SCHEDULER_QUEUE_TIMEOUT = 60.0  # seconds a caller may wait for a slot or rate-limit token
+    RETRY_MAX_ATTEMPTS = 5
+    RETRY_BASE_DELAY = 0.5  # seconds; backoff doubles per attempt with full jitter
+    RETRY_MAX_DELAY = 30.0
+
+    # Approximate Queries
+    APPROX_SAMPLE_PERCENT = 10  # share of the table scanned in approximate mode
+
+    # Tracing & Metrics
+    TRACE_EXPORT_PATH = os.getenv('TRACE_EXPORT_PATH')  # JSON lines, one finished span per line
+    METRICS_EXPORT_PATH = os.getenv('METRICS_EXPORT_PATH')  # Prometheus text format
+    TRACE_MAX_SPANS = 10000  # spans kept in memory
+
     @classmethod
     def validate(cls):
         """Validate that all required configuration is present"""
@@ -89,9 +132,13 @@ class Config:
         return True
 
     @classmethod
-    def get_bigquery_table_path(cls):
-        """Get the full BigQuery table path"""
-        return f"{cls.BIGQUERY_PROJECT}.{cls.BIGQUERY_DATASET}.{cls.BIGQUERY_TABLE}"
+    def get_bigquery_table_path(cls, year: int = None):
+        """
+        Get the full BigQuery table path for a single year's table, or the
+        wildcard path covering every year when year is None
+        """
+        suffix = str(year) if year is not None else '*'
+        return f"{cls.BIGQUERY_PROJECT}.{cls.BIGQUERY_DATASET}.{cls.BIGQUERY_TABLE_PREFIX}{suffix}"
 
 
 # Validate configuration on import
@@ -2,11 +2,16 @@
 LLM-powered agent for querying and visualizing NOAA weather data
 """
 
+import uuid
 import anthropic
 import google.generativeai as genai
 from pathlib import Path
 from config import Config
+from tracing import tracer
+from scheduler import scheduler
+from plan_cache import plan_cache as default_plan_cache
 from tools import execute_bigquery_query, create_visualization
+from tools.query_jobs import registry as query_jobs, cancellation_scope
 from typing import List, Dict, Any
 
 
@@ -50,14 +55,28 @@ TOOL_DEFINITIONS = [
                 },
                 "metric_aggregation": {
                     "type": "string",
-                    "enum": ["avg", "min", "max"],
-                    "description": "Metric aggregation function (avg, min, max)",
+                    "enum": ["avg", "min", "max", "stddev", "median", "p10", "p25", "p75", "p90", "p95", "p99"],
+                    "description": "Metric aggregation function (avg, min, max, stddev, median or percentiles p10-p99)",
                     "default": "avg"
                 },
                 "output_filename": {
                     "type": "string",
                     "description": "Name of the output CSV file",
                     "default": "weather_data.csv"
+                },
+                "approximate": {
+                    "type": "boolean",
+                    "description": "Return a fast estimate from a sample of the data, with 95% error bounds for averages. Use for exploratory or 'roughly' questions. Raw rows and min/max always run exactly.",
+                    "default": False
+                },
+                "sample_percent": {
+                    "type": "number",
+                    "description": "Percent of the data to sample in approximate mode: more than 0, at most 100 (default 10)"
+                },
+                "refine_in_background": {
+                    "type": "boolean",
+                    "description": "In approximate mode, also compute the exact result in the background and save it to <output>_exact.csv",
+                    "default": False
                 }
             },
             "required": ["start_date", "end_date", "metrics"]
@@ -94,8 +113,18 @@ TOOL_DEFINITIONS = [
                 },
                 "output_filename": {
                     "type": "string",
-                    "description": "Name of the output PNG file",
+                    "description": "Name of the output chart file",
                     "default": "visualization.png"
+                },
+                "output_format": {
+                    "type": "string",
+                    "enum": ["png", "svg", "json"],
+                    "description": "Output format: png image, svg vector image, or json series spec for client-side rendering",
+                    "default": "png"
+                },
+                "max_categories": {
+                    "type": "integer",
+                    "description": "Bar charts only: keep the top N categories and group the rest as 'Other' (0 disables)"
                 }
             },
             "required": ["csv_filepath", "x_column", "y_columns"]
@@ -121,8 +150,11 @@ GEMINI_TOOLS = [
                         "station_id": genai.protos.Schema(type=genai.protos.Type.STRING, description="Specific weather station ID"),
                         "metrics": genai.protos.Schema(type=genai.protos.Type.ARRAY, items=genai.protos.Schema(type=genai.protos.Type.STRING), description="List of metrics to retrieve: temp, max, min, prcp, wdsp, dewp, slp, sndp"),
                         "aggregation": genai.protos.Schema(type=genai.protos.Type.STRING, description="How to aggregate the data: daily, weekly, monthly, none"),
-                        "metric_aggregation": genai.protos.Schema(type=genai.protos.Type.STRING, description="Metric aggregation function (avg, min, max)"),
+                        "metric_aggregation": genai.protos.Schema(type=genai.protos.Type.STRING, description="Metric aggregation function (avg, min, max, stddev, median or percentiles p10, p25, p75, p90, p95, p99)"),
                         "output_filename": genai.protos.Schema(type=genai.protos.Type.STRING, description="Name of the output CSV file"),
+                        "approximate": genai.protos.Schema(type=genai.protos.Type.BOOLEAN, description="Return a fast estimate from a sample of the data, with 95% error bounds for averages. Use for exploratory or 'roughly' questions. Raw rows and min/max always run exactly."),
+                        "sample_percent": genai.protos.Schema(type=genai.protos.Type.NUMBER, description="Percent of the data to sample in approximate mode: more than 0, at most 100 (default 10)"),
+                        "refine_in_background": genai.protos.Schema(type=genai.protos.Type.BOOLEAN, description="In approximate mode, also compute the exact result in the background and save it to <output>_exact.csv"),
                     },
                     required=["start_date", "end_date", "metrics"]
                 )
@@ -138,7 +170,9 @@ GEMINI_TOOLS = [
                         "x_column": genai.protos.Schema(type=genai.protos.Type.STRING, description="Column name to use for x-axis"),
                         "y_columns": genai.protos.Schema(type=genai.protos.Type.ARRAY, items=genai.protos.Schema(type=genai.protos.Type.STRING), description="Column name(s) to use for y-axis. Can be multiple for comparison."),
                         "title": genai.protos.Schema(type=genai.protos.Type.STRING, description="Title for the chart"),
-                        "output_filename": genai.protos.Schema(type=genai.protos.Type.STRING, description="Name of the output PNG file"),
+                        "output_filename": genai.protos.Schema(type=genai.protos.Type.STRING, description="Name of the output chart file"),
+                        "output_format": genai.protos.Schema(type=genai.protos.Type.STRING, description="Output format: png, svg, or json (series spec for client-side rendering)"),
+                        "max_categories": genai.protos.Schema(type=genai.protos.Type.INTEGER, description="Bar charts only: keep the top N categories and group the rest as 'Other' (0 disables)"),
                     },
                     required=["csv_filepath", "x_column", "y_columns"]
                 )
@@ -162,16 +196,37 @@ class LLMClient:
             )
             self.chat = None
         elif provider == "anthropic":
-            self.client = anthropic.Anthropic(api_key=Config.ANTHROPIC_API_KEY)
+            # Retries are handled by the shared scheduler
+            self.client = anthropic.Anthropic(api_key=Config.ANTHROPIC_API_KEY, max_retries=0)
         else:
             raise ValueError(f"Unknown provider: {provider}")
 
     def send_message(self, messages: List[Dict], system_prompt: str) -> Any:
         """Send a message and get a response"""
-        if self.provider == "gemini":
-            return self._send_gemini(messages, system_prompt)
-        else:
-            return self._send_anthropic(messages, system_prompt)
+        with tracer.span("llm.send_message", provider=self.provider, message_count=len(messages)) as span:
+            if self.provider == "gemini":
+                result = self._send_gemini(messages, system_prompt)
+            else:
+                result = self._send_anthropic(messages, system_prompt)
+            span.set_attribute("stop_reason", result["stop_reason"])
+            span.set_attribute("tool_calls", sum(1 for block in result["content"] if block["type"] == "tool_use"))
+        return result
+
+    def checkpoint(self) -> int:
+        """Length of the provider-side history (Gemini's chat session keeps its own copy)"""
+        if self.provider == "gemini" and self.chat is not None:
+            return len(self.chat.history)
+        return 0
+
+    def rewind(self, checkpoint: int):
+        """Drop provider-side history recorded after a checkpoint, e.g. an interrupted turn"""
+        if self.provider != "gemini" or self.chat is None:
+            return
+        try:
+            self.chat.history = self.chat.history[:checkpoint]
+        except Exception:
+            # The interrupted exchange left the session unreadable: start a fresh one
+            self.chat = None
 
     def _send_gemini(self, messages: List[Dict], system_prompt: str) -> Dict:
         """Send message to Gemini"""
@@ -186,7 +241,7 @@ class LLMClient:
             last_message = "\n".join([str(item) for item in last_message])
 
         # Send message
-        response = self.chat.send_message(last_message)
+        response = scheduler.call("gemini", self.chat.send_message, last_message)
 
         # Parse response
         result = {
@@ -216,7 +271,9 @@ class LLMClient:
 
     def _send_anthropic(self, messages: List[Dict], system_prompt: str) -> Dict:
         """Send message to Anthropic"""
-        response = self.client.messages.create(
+        response = scheduler.call(
+            "anthropic",
+            self.client.messages.create,
             model="claude-sonnet-4-20250514",
             max_tokens=4096,
             system=system_prompt,
@@ -245,7 +302,7 @@ class LLMClient:
         return result
 
 
-def process_tool_call(tool_name: str, tool_input: dict) -> str:
+def execute_tool(tool_name: str, tool_input: dict) -> dict:
     """
     Execute the appropriate tool based on the tool name
 
@@ -254,23 +311,202 @@ def process_tool_call(tool_name: str, tool_input: dict) -> str:
         tool_input: Dictionary of input parameters for the tool
 
     Returns:
-        str: Result message from tool execution
+        dict: Raw result dictionary from the tool
     """
 
-    if tool_name == "bigquery_query_tool":
-        result = execute_bigquery_query(**tool_input)
-    elif tool_name == "visualization_tool":
-        result = create_visualization(**tool_input)
-    else:
-        result = {"success": False, "message": f"Unknown tool: {tool_name}"}
+    with tracer.span("tool_call", tool=tool_name) as span:
+        if tool_name == "bigquery_query_tool":
+            result = execute_bigquery_query(**tool_input)
+        elif tool_name == "visualization_tool":
+            result = create_visualization(**tool_input)
+        else:
+            result = {"success": False, "message": f"Unknown tool: {tool_name}"}
+        span.set_attribute("success", result["success"])
+    return result
 
-    # Format result as string
+
+def format_tool_result(result: dict) -> str:
+    """Format a tool result dictionary as the string sent back to the LLM"""
     if result["success"]:
         return result["message"]
     else:
         return f"Error: {result['message']}"
 
 
+def process_tool_call(tool_name: str, tool_input: dict) -> str:
+    """
+    Execute the appropriate tool based on the tool name
+
+    Args:
+        tool_name: Name of the tool to execute
+        tool_input: Dictionary of input parameters for the tool
+
+    Returns:
+        str: Result message from tool execution
+    """
+    return format_tool_result(execute_tool(tool_name, tool_input))
+
+
+def run_agent_turn(
+    llm_client,
+    conversation_history: List[Dict],
+    user_input: str,
+    system_prompt: str,
+    tool_runner=process_tool_call,
+    plan_cache=None,
+    use_plan_cache: bool = True
+) -> str:
+    """
+    Run one user turn through the LLM/tool loop
+
+    Args:
+        llm_client: Object with a send_message(messages, system_prompt) method
+        conversation_history: Conversation so far; updated in place
+        user_input: The user's message
+        system_prompt: System prompt for the LLM
+        tool_runner: Callable(tool_name, tool_input) -> str used to run tools
+        plan_cache: Optional PlanCache. Turns whose tools all succeed are
+            recorded in it, and a confident match for the question is
+            replayed instead of asking the LLM to plan
+        use_plan_cache: False to skip replaying (the turn is still recorded)
+
+    Returns:
+        str: Final assistant text for the turn
+    """
+    with tracer.span("agent.turn", provider=getattr(llm_client, "provider", None)) as turn_span:
+        # Add user message to history
+        conversation_history.append({
+            "role": "user",
+            "content": user_input
+        })
+
+        # Replay a cached plan if there is a confident one; the LLM then
+        # only writes the answer from the results
+        response = None
+        if plan_cache is not None and use_plan_cache:
+            response = _replay_plan(plan_cache, llm_client, conversation_history, user_input, system_prompt, tool_runner)
+        replayed = response is not None
+        turn_span.set_attribute("plan_replayed", replayed)
+
+        # Send request to LLM
+        if response is None:
+            response = llm_client.send_message(conversation_history, system_prompt)
+
+        # Tool calls made this turn, recorded as a plan if they all succeed
+        tool_calls = []
+        tools_succeeded = True
+
+        # Process response
+        while response["stop_reason"] == "tool_use":
+            # Add assistant's response to history
+            conversation_history.append({
+                "role": "assistant",
+                "content": response["content"]
+            })
+
+            # Extract text content to display
+            text_content = []
+            for block in response["content"]:
+                if block["type"] == "text":
+                    text_content.append(block["text"])
+
+            if text_content:
+                print(f"\nAssistant: {' '.join(text_content)}")
+
+            # Extract and execute tool calls
+            tool_results = []
+            for block in response["content"]:
+                if block["type"] == "tool_use":
+                    print(f"\n[Executing {block['name']}...]")
+
+                    # Execute tool
+                    result = tool_runner(block["name"], block["input"])
+                    tool_calls.append((block["name"], block["input"]))
+                    tools_succeeded = tools_succeeded and not result.startswith("Error:")
+
+                    # Add result to tool_results
+                    tool_results.append({
+                        "type": "tool_result",
+                        "tool_use_id": block["id"],
+                        "content": result
+                    })
+
+                    print(f"[Result: {result}]")
+
+            # Add tool results to history
+            conversation_history.append({
+                "role": "user",
+                "content": tool_results
+            })
+
+            # Get next response from LLM
+            response = llm_client.send_message(conversation_history, system_prompt)
+
+        # Display final response
+        final_text = []
+        for block in response["content"]:
+            if block["type"] == "text":
+                final_text.append(block["text"])
+
+        if final_text:
+            print(f"\nAssistant: {' '.join(final_text)}")
+
+        # Add final response to history
+        conversation_history.append({
+            "role": "assistant",
+            "content": response["content"]
+        })
+
+        if plan_cache is not None and not replayed and tool_calls and tools_succeeded:
+            plan_cache.record(user_input, tool_calls)
+
+    return ' '.join(final_text)
+
+
+def _replay_plan(plan_cache, llm_client, conversation_history: List[Dict], user_input: str,
+                 system_prompt: str, tool_runner) -> Dict:
+    """
+    Run the cached plan for a question and ask the LLM to narrate the results
+
+    The replayed calls go into the history as if the LLM had made them.
+    Replay stops at the first failing tool; the LLM sees the error and can
+    carry on with its own tool calls.
+
+    Returns:
+        dict: The LLM's response to the results, or None if no plan is confident enough
+    """
+    match = plan_cache.lookup(user_input)
+    if match is None or match.confidence < Config.PLAN_CACHE_MIN_CONFIDENCE:
+        return None
+
+    print(f"\n[Replaying saved plan for this kind of question (confidence {match.confidence:.2f})]")
+    tool_uses, tool_results = [], []
+    with tracer.span("plan_cache.replay", calls=len(match.calls), confidence=round(match.confidence, 3)) as span:
+        # tool_use ids must be unique across the conversation, not just this replay
+        replay_id = uuid.uuid4().hex[:12]
+        for i, (tool_name, tool_input) in enumerate(match.calls):
+            print(f"\n[Executing {tool_name}...]")
+            result = tool_runner(tool_name, tool_input)
+            print(f"[Result: {result}]")
+
+            tool_use_id = f"plan_{replay_id}_{i}"
+            tool_uses.append({"type": "tool_use", "name": tool_name, "input": tool_input, "id": tool_use_id})
+            tool_results.append({"type": "tool_result", "tool_use_id": tool_use_id, "content": result})
+            if result.startswith("Error:"):
+                plan_cache.record_failure(user_input)
+                span.set_attribute("failed_tool", tool_name)
+                break
+
+    tool_results.append({
+        "type": "text",
+        "text": f"The tool calls above were replayed from a saved plan for: \"{user_input}\". "
+                "Answer the user from these results; only call more tools if they don't answer the question."
+    })
+    conversation_history.append({"role": "assistant", "content": tool_uses})
+    conversation_history.append({"role": "user", "content": tool_results})
+    return llm_client.send_message(conversation_history, system_prompt)
+
+
 def load_system_prompt() -> str:
     """Load system prompt from file"""
     prompt_path = Config.PROMPTS_DIR / 'system_prompt.txt'
@@ -281,15 +517,27 @@ def load_system_prompt() -> str:
         return "You are a helpful weather data assistant."
 
 
+def print_query_jobs():
+    """Print running and recently finished BigQuery jobs"""
+    jobs = query_jobs.jobs()
+    if not jobs:
+        print("\nNo BigQuery jobs yet.")
+        return
+    print(f"\n{'job id':<40}{'state':<12}{'elapsed':>10}  scope")
+    for job in jobs:
+        print(f"{job['job_id']:<40}{job['state']:<12}{job['elapsed']:>9.1f}s  {job['scope'] or '-'}")
+
+
 def main():
     """Main conversation loop"""
 
     print("=" * 60)
-    print("Weather Data Agent - NOAA GSOD 2024 Query & Visualization")
+    print("Weather Data Agent - NOAA GSOD Query & Visualization")
     print("=" * 60)
     print(f"Using LLM Provider: {Config.LLM_PROVIDER.upper()}")
     print("\nType 'exit', 'quit', or 'bye' to end the conversation.")
-    print("Type 'help' to see what I can do.\n")
+    print("Type 'help' to see what I can do, or 'jobs' to list BigQuery jobs.")
+    print("Press Ctrl-C during a request to cancel it. Start a question with '!' to skip saved plans.\n")
 
     # Validate configuration
     try:
@@ -312,93 +560,65 @@ def main():
     conversation_history = []
 
     # Main conversation loop
-    while True:
-        try:
-            # Get user input
-            user_input = input("\nYou: ").strip()
-
-            if not user_input:
-                continue
-
-            # Check for exit commands
-            if user_input.lower() in ['exit', 'quit', 'bye']:
-                print("\nGoodbye! Thanks for using Weather Data Agent.")
+    try:
+        while True:
+            try:
+                # Get user input
+                user_input = input("\nYou: ").strip()
+
+                if not user_input:
+                    continue
+
+                # Check for exit commands
+                if user_input.lower() in ['exit', 'quit', 'bye']:
+                    print("\nGoodbye! Thanks for using Weather Data Agent.")
+                    break
+
+                if user_input.lower() == 'jobs':
+                    print_query_jobs()
+                    continue
+
+                # A leading '!' asks the LLM to plan afresh instead of replaying a saved plan
+                use_plan_cache = not user_input.startswith('!')
+                user_input = user_input.lstrip('!').strip()
+                if not user_input:
+                    continue
+
+                # Each turn gets its own cancellation scope; Ctrl-C during a
+                # turn cancels that turn's BigQuery jobs and drops the partial
+                # exchange from the history (ours and the LLM client's), then
+                # returns to the prompt
+                turn_start = len(conversation_history)
+                llm_checkpoint = llm_client.checkpoint()
+                with cancellation_scope("turn") as scope:
+                    try:
+                        run_agent_turn(
+                            llm_client, conversation_history, user_input, system_prompt,
+                            plan_cache=default_plan_cache if Config.PLAN_CACHE_ENABLED else None,
+                            use_plan_cache=use_plan_cache
+                        )
+                    except KeyboardInterrupt:
+                        scope.cancel("interrupted")
+                        del conversation_history[turn_start:]
+                        llm_client.rewind(llm_checkpoint)
+                        print("\n\n[Interrupted: turn cancelled along with its running queries]")
+                        continue
+                    except BaseException:
+                        scope.cancel("turn failed")
+                        raise
+                tracer.write_metrics()
+
+            except KeyboardInterrupt:
+                print("\n\nInterrupted. Goodbye!")
                 break
-
-            # Add user message to history
-            conversation_history.append({
-                "role": "user",
-                "content": user_input
-            })
-
-            # Send request to LLM
-            response = llm_client.send_message(conversation_history, system_prompt)
-
-            # Process response
-            while response["stop_reason"] == "tool_use":
-                # Add assistant's response to history
-                conversation_history.append({
-                    "role": "assistant",
-                    "content": response["content"]
-                })
-
-                # Extract text content to display
-                text_content = []
-                for block in response["content"]:
-                    if block["type"] == "text":
-                        text_content.append(block["text"])
-
-                if text_content:
-                    print(f"\nAssistant: {' '.join(text_content)}")
-
-                # Extract and execute tool calls
-                tool_results = []
-                for block in response["content"]:
-                    if block["type"] == "tool_use":
-                        print(f"\n[Executing {block['name']}...]")
-
-                        # Execute tool
-                        result = process_tool_call(block["name"], block["input"])
-
-                        # Add result to tool_results
-                        tool_results.append({
-                            "type": "tool_result",
-                            "tool_use_id": block["id"],
-                            "content": result
-                        })
-
-                        print(f"[Result: {result}]")
-
-                # Add tool results to history
-                conversation_history.append({
-                    "role": "user",
-                    "content": tool_results
-                })
-
-                # Get next response from LLM
-                response = llm_client.send_message(conversation_history, system_prompt)
-
-            # Display final response
-            final_text = []
-            for block in response["content"]:
-                if block["type"] == "text":
-                    final_text.append(block["text"])
-
-            if final_text:
-                print(f"\nAssistant: {' '.join(final_text)}")
-
-            # Add final response to history
-            conversation_history.append({
-                "role": "assistant",
-                "content": response["content"]
-            })
-
-        except KeyboardInterrupt:
-            print("\n\nInterrupted. Goodbye!")
-            break
-        except Exception as e:
-            print(f"\nError: {e}")
-            print("Please try again or type 'exit' to quit.")
+            except Exception as e:
+                print(f"\nError: {e}")
+                print("Please try again or type 'exit' to quit.")
+    finally:
+        # Don't leave background refinements running (and billing) after exit
+        cancelled = query_jobs.cancel_all("shutdown")
+        if cancelled:
+            print(f"Cancelled {cancelled} running BigQuery job(s).")
 
 
 if __name__ == "__main__":
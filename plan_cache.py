@@ -0,0 +1,363 @@
+"""
+Plan cache for Weather Data Agent
+Remembers the tool calls the LLM made for a shape of question and replays
+them, with the new question's dates, months, years, places and numbers, without
+asking the LLM to plan again
+"""
+
+import calendar
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from config import Config
+
+# US state names -> the two-letter codes the query tool expects
+US_STATES = {
+    'alabama': 'AL', 'alaska': 'AK', 'arizona': 'AZ', 'arkansas': 'AR', 'california': 'CA',
+    'colorado': 'CO', 'connecticut': 'CT', 'delaware': 'DE', 'florida': 'FL', 'georgia': 'GA',
+    'hawaii': 'HI', 'idaho': 'ID', 'illinois': 'IL', 'indiana': 'IN', 'iowa': 'IA',
+    'kansas': 'KS', 'kentucky': 'KY', 'louisiana': 'LA', 'maine': 'ME', 'maryland': 'MD',
+    'massachusetts': 'MA', 'michigan': 'MI', 'minnesota': 'MN', 'mississippi': 'MS', 'missouri': 'MO',
+    'montana': 'MT', 'nebraska': 'NE', 'nevada': 'NV', 'new hampshire': 'NH', 'new jersey': 'NJ',
+    'new mexico': 'NM', 'new york': 'NY', 'north carolina': 'NC', 'north dakota': 'ND', 'ohio': 'OH',
+    'oklahoma': 'OK', 'oregon': 'OR', 'pennsylvania': 'PA', 'rhode island': 'RI', 'south carolina': 'SC',
+    'south dakota': 'SD', 'tennessee': 'TN', 'texas': 'TX', 'utah': 'UT', 'vermont': 'VT',
+    'virginia': 'VA', 'washington': 'WA', 'west virginia': 'WV', 'wisconsin': 'WI', 'wyoming': 'WY',
+}
+
+STATE_CODES = set(US_STATES.values())
+
+# State codes that are also ISO country codes (CA: California or Canada?).
+# A question using one can't be typed as a state or a country, so it is
+# left to the LLM
+AMBIGUOUS_CODES = {
+    'AL', 'AR', 'AZ', 'CA', 'CO', 'DE', 'GA', 'ID', 'IL', 'IN', 'KY', 'LA', 'MA',
+    'MD', 'ME', 'MN', 'MO', 'MS', 'MT', 'NC', 'NE', 'PA', 'SC', 'SD', 'TN', 'VA',
+}
+
+MONTHS = ['january', 'february', 'march', 'april', 'may', 'june', 'july',
+          'august', 'september', 'october', 'november', 'december']
+
+# Parameter slots recognised in a question, tried in this order; text
+# matched by an earlier pattern is not matched again by a later one.
+# Two-letter codes are typed state, country or code (ambiguous) once matched.
+SLOT_PATTERNS = [
+    ('date', re.compile(r"\b\d{4}-\d{2}-\d{2}\b")),
+    # "may" only when capitalised, so the verb isn't taken for the month
+    ('month', re.compile(r"\b(?:(?i:" + "|".join(m for m in MONTHS if m != 'may') + r")|May)\b")),
+    ('state', re.compile(r"\b(" + "|".join(sorted(US_STATES, key=len, reverse=True)) + r")\b", re.IGNORECASE)),
+    ('year', re.compile(r"\b(?:1[89]|20)\d{2}\b")),
+    ('code', re.compile(r"\b[A-Z]{2}\b")),
+    ('number', re.compile(r"\b\d+(?:\.\d+)?\b")),
+]
+
+# Tool input keys whose value may only come from one type of slot
+TYPED_KEYS = {'state': {'state'}, 'country': {'country'}}
+
+# Stands in for the day of a month-end date (2024-03-31) whose month is a
+# slot, so the replayed date ends on the new month's last day
+LAST_DAY = "<<last_day>>"
+
+# Words that refer back to earlier turns; questions using them aren't cached
+CONTEXT_WORDS = re.compile(
+    r"\b(?:same|it|that|those|these|them|again|too|also|instead|previous|earlier|above|how about|what about)\b",
+    re.IGNORECASE
+)
+
+# Tool inputs holding dates, which a cached plan must fill from slots
+DATE_KEYS = ('start_date', 'end_date')
+
+# A parametrized date built from slots: a date slot, or a year slot with a
+# literal or slot month and a literal or month-end day
+SLOT_DATE = re.compile(
+    r"^(?:<<slot:\d+>>|<<slot:\d+>>-(?:\d{2}|<<slot:\d+>>)-(?:\d{2}|" + re.escape(LAST_DAY) + r"))$"
+)
+
+
+def _boundary(text: str) -> re.Pattern:
+    """Match text as a whole token (letters/digits on neither side)"""
+    return re.compile(r"(?<![A-Za-z0-9])" + re.escape(text) + r"(?![A-Za-z0-9])")
+
+
+def _identifier_boundary(text: str) -> re.Pattern:
+    """
+    Match text as a token joined to an identifier by _ - . or / (e.g. tx in
+    tx_2024.csv), so lower-cased codes in filenames are found without also
+    matching ordinary words like "in" or "or"
+    """
+    text = re.escape(text)
+    return re.compile(
+        r"(?<![A-Za-z0-9])" + text + r"(?=[_.\-/])|(?<=[_.\-/])" + text + r"(?![A-Za-z0-9])"
+    )
+
+
+def _code_type(code: str) -> str:
+    """Slot type of a two-letter code: state, country or (if it could be either) code"""
+    if code in AMBIGUOUS_CODES:
+        return 'code'
+    return 'state' if code in STATE_CODES else 'country'
+
+
+def extract_slots(question: str) -> tuple:
+    """
+    Split a question into a template and its parameter slots
+
+    Returns:
+        tuple: (template, slots) where template is the lower-cased question
+        with each slot replaced by <type>, and slots is a list of
+        {"type", "text", "value"} in order of appearance
+    """
+    found = []  # (start, end, type, text)
+    masked = question
+    for slot_type, pattern in SLOT_PATTERNS:
+        for match in pattern.finditer(masked):
+            found.append((match.start(), match.end(), slot_type, match.group(0)))
+        masked = pattern.sub(lambda m: "\0" * len(m.group(0)), masked)
+    found.sort()
+
+    slots, parts, position = [], [], 0
+    for start, end, slot_type, text in found:
+        if slot_type == 'code':
+            slot_type = _code_type(text)
+        parts.append(question[position:start])
+        parts.append(f"<{slot_type}>")
+        position = end
+        if slot_type == 'state':
+            value = US_STATES.get(text.lower(), text.upper())
+        elif slot_type == 'month':
+            value = f"{MONTHS.index(text.lower()) + 1:02d}"
+        elif slot_type == 'number':
+            value = float(text) if '.' in text else int(text)
+        else:
+            value = text
+        slots.append({"type": slot_type, "text": text, "value": value})
+    parts.append(question[position:])
+
+    template = re.sub(r"[^\w<>]+", " ", "".join(parts).lower()).strip()
+    return template, slots
+
+
+def _replayable(question: str, slots: list) -> bool:
+    """
+    Whether a question can be cached: one without slots ("now chart it") or
+    referring back to the conversation ("now do the same for Ohio") leans on
+    earlier turns, and an ambiguous code can't be typed
+    """
+    if not slots or any(slot["type"] == 'code' for slot in slots):
+        return False
+    return not CONTEXT_WORDS.search(question)
+
+
+def _self_contained(tool_calls: list, plan: list) -> bool:
+    """
+    Whether a plan depends only on its question: every date input is built
+    from the question's slots (not "last month" resolved to fixed dates), and
+    every chart reads a file an earlier call of the same plan wrote
+    """
+    written = set()
+    for (name, tool_input), (_, parametrized) in zip(tool_calls, plan):
+        for key in DATE_KEYS:
+            if key in tool_input and not _slot_date(parametrized.get(key)):
+                return False
+        csv_filepath = tool_input.get('csv_filepath')
+        if csv_filepath and Path(csv_filepath).name not in written:
+            return False
+        if tool_input.get('output_filename'):
+            written.add(Path(tool_input['output_filename']).name)
+    return True
+
+
+def _slot_date(value) -> bool:
+    """Whether a parametrized date takes its year (or whole date) from a slot"""
+    return isinstance(value, dict) and bool(SLOT_DATE.match(value.get("$template", "")))
+
+
+def _month_position(month: str) -> re.Pattern:
+    """Match a two-digit month where it sits in a date (after the year, or a year marker)"""
+    return re.compile(r"(?:(?<=\d{4}-)|(?<=>>-))" + re.escape(month) + r"(?=-|(?![A-Za-z0-9]))")
+
+
+def _mark_month_ends(value: str, slots: list) -> str:
+    """Replace the day of YYYY-MM-DD dates that end a slot month with LAST_DAY"""
+    months = {slot["value"] for slot in slots if slot["type"] == 'month'}
+
+    def mark(match):
+        year, month, day = match.groups()
+        if month in months and int(day) == calendar.monthrange(int(year), int(month))[1]:
+            return f"{year}-{month}-{LAST_DAY}"
+        return match.group(0)
+
+    return re.sub(r"\b(\d{4})-(\d{2})-(\d{2})\b", mark, value) if months else value
+
+
+def _fill_month_ends(value: str) -> str:
+    """Inverse of _mark_month_ends, once the year and month are filled in"""
+    def fill(match):
+        year, month = int(match.group(1)), int(match.group(2))
+        if not 1 <= month <= 12:
+            return match.group(0)
+        return f"{match.group(1)}-{match.group(2)}-{calendar.monthrange(year, month)[1]:02d}"
+
+    return re.sub(r"(\d{4})-(\d{2})-" + re.escape(LAST_DAY), fill, value)
+
+
+def parametrize(value, slots: list, types: set = None):
+    """
+    Replace the slot values a recorded tool input uses with references
+
+    Strings become {"$template": ...} with <<slot:i>> (the slot's value) and
+    <<text:i>> (its wording in the question) markers, or their lower-case
+    forms <<slot_lower:i>>/<<text_lower:i>> inside identifiers; numbers
+    equal to a number slot become {"$slot": i}. Anything else is kept
+    literally. Values under TYPED_KEYS (state, country) only reference slots
+    of their own type.
+    """
+    if isinstance(value, dict):
+        return {key: parametrize(item, slots, TYPED_KEYS.get(key, types)) for key, item in value.items()}
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        for i, slot in enumerate(slots):
+            if slot["type"] == 'number' and slot["value"] == value:
+                return {"$slot": i}
+        return value
+    if isinstance(value, str):
+        template = _mark_month_ends(value, slots)
+        # Longest first, so a date isn't broken up by a year inside it
+        for i, slot in sorted(enumerate(slots), key=lambda s: -len(str(s[1]["value"]))):
+            if types and slot["type"] not in types:
+                continue
+            forms = {"slot": str(slot["value"]), "text": slot["text"]}
+            for form, text in forms.items():
+                if form == "text" and text == forms["slot"]:
+                    continue
+                # A month's number is only the month inside a date, not any "03"
+                pattern = _month_position(text) if slot["type"] == 'month' and form == "slot" else _boundary(text)
+                template = pattern.sub(f"<<{form}:{i}>>", template)
+                if text.lower() != text:
+                    template = _identifier_boundary(text.lower()).sub(f"<<{form}_lower:{i}>>", template)
+        return {"$template": template} if template != value else value
+    # Lists and list-like values from the Gemini SDK
+    return [parametrize(item, slots, types) for item in value]
+
+
+def instantiate(value, slots: list):
+    """Inverse of parametrize: fill references in with another question's slots"""
+    if isinstance(value, dict):
+        if "$slot" in value:
+            return slots[value["$slot"]]["value"]
+        if "$template" in value:
+            filled = re.sub(r"<<(slot|text)(_lower)?:(\d+)>>", _fill_marker(slots), value["$template"])
+            return _fill_month_ends(filled)
+        return {key: instantiate(item, slots) for key, item in value.items()}
+    if isinstance(value, list):
+        return [instantiate(item, slots) for item in value]
+    return value
+
+
+def _fill_marker(slots: list):
+    """re.sub replacement for <<form[_lower]:i>> markers"""
+    def fill(match):
+        slot = slots[int(match.group(3))]
+        text = str(slot["value"] if match.group(1) == 'slot' else slot["text"])
+        return text.lower() if match.group(2) else text
+    return fill
+
+
+def _referenced_slots(value) -> set:
+    """Slot indexes a parametrized value refers to"""
+    if isinstance(value, dict):
+        if "$slot" in value:
+            return {value["$slot"]}
+        if "$template" in value:
+            return {int(i) for i in re.findall(r"<<(?:slot|text)(?:_lower)?:(\d+)>>", value["$template"])}
+        return set().union(*(_referenced_slots(item) for item in value.values()))
+    if isinstance(value, list):
+        return set().union(*(_referenced_slots(item) for item in value))
+    return set()
+
+
+class PlanMatch:
+    """A cached plan filled in for a new question"""
+
+    def __init__(self, template: str, calls: list, confidence: float):
+        self.template = template
+        self.calls = calls  # [(tool_name, tool_input), ...]
+        self.confidence = confidence
+
+
+class PlanCache:
+    """
+    Maps question templates to the tool-call sequence the LLM chose for them.
+
+    Confidence for a template is the product of:
+      - coverage: share of the question's slots the plan actually uses (a
+        plan that ignores a date or place in the question can't be reused)
+      - agreement: share of recordings that produced this same plan
+      - repetition: 1 - 0.5 ** times seen, so one observation is never enough
+        under the default threshold
+    """
+
+    def __init__(self, max_entries: int = None):
+        self.max_entries = max_entries or Config.PLAN_CACHE_SIZE
+        self._entries = OrderedDict()  # template -> {"plan", "observations", "conflicts"}
+        self._lock = threading.Lock()
+
+    def record(self, question: str, tool_calls: list):
+        """Remember the tool calls ([(name, input), ...]) that answered a question"""
+        template, slots = extract_slots(question)
+        if not _replayable(question, slots):
+            return
+        plan = [(name, parametrize(tool_input, slots)) for name, tool_input in tool_calls]
+        if not _self_contained(tool_calls, plan):
+            return
+        with self._lock:
+            entry = self._entries.get(template)
+            if entry is None:
+                entry = {"plan": plan, "observations": 0, "conflicts": 0}
+                self._entries[template] = entry
+            elif entry["plan"] != plan:
+                # The LLM answered this shape differently: start over, remembering the disagreement
+                entry["plan"] = plan
+                entry["observations"] = 0
+                entry["conflicts"] += 1
+            entry["observations"] += 1
+            self._entries.move_to_end(template)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def record_failure(self, question: str):
+        """Count a replay whose tools failed against the plan"""
+        template, _ = extract_slots(question)
+        with self._lock:
+            if template in self._entries:
+                self._entries[template]["conflicts"] += 1
+
+    def lookup(self, question: str) -> PlanMatch:
+        """The cached plan for a question's template, filled in with its slots, or None"""
+        template, slots = extract_slots(question)
+        if not _replayable(question, slots):
+            return None
+        with self._lock:
+            entry = self._entries.get(template)
+            if entry is None:
+                return None
+            self._entries.move_to_end(template)
+            plan, observations, conflicts = entry["plan"], entry["observations"], entry["conflicts"]
+
+        referenced = set().union(*(_referenced_slots(tool_input) for _, tool_input in plan))
+        coverage = len(referenced) / len(slots)
+        agreement = observations / (observations + conflicts)
+        confidence = coverage * agreement * (1 - 0.5 ** observations)
+        calls = [(name, instantiate(tool_input, slots)) for name, tool_input in plan]
+        return PlanMatch(template, calls, confidence)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Process-wide plan cache used by the orchestrator
+plan_cache = PlanCache()
@@ -0,0 +1,255 @@
+"""
+Request scheduler for Weather Data Agent
+Shared rate limiting, retries and concurrency caps for calls to the LLM
+providers and BigQuery
+"""
+
+import email.utils
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from config import Config
+from tracing import tracer
+
+# HTTP statuses worth retrying: timeouts, rate limits and server errors
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504, 529}
+
+# Exception classes (matched by name anywhere in the MRO, so provider SDKs
+# needn't be imported here) that mean the request never got a response
+CONNECTION_ERRORS = {'ConnectionError', 'TimeoutError', 'APIConnectionError'}
+
+# Adaptive rate: halve on a rate-limit response, recover by this share of
+# the configured rate per success, never below MIN_RATE_FRACTION of it
+RATE_RECOVERY_STEP = 0.1
+MIN_RATE_FRACTION = 0.1
+
+
+class SchedulerBusy(Exception):
+    """Too many requests are already queued for a provider"""
+
+
+def status_code(exc: Exception) -> int:
+    """HTTP status of a provider error (anthropic .status_code, google .code), if any"""
+    for attribute in ('status_code', 'code'):
+        value = getattr(exc, attribute, None)
+        if isinstance(value, int):
+            return int(value)
+    return getattr(getattr(exc, 'response', None), 'status_code', None)
+
+
+def retry_after(exc: Exception) -> float:
+    """Seconds to wait from the error response's Retry-After header, if it has one"""
+    headers = getattr(getattr(exc, 'response', None), 'headers', None)
+    if not headers:
+        return None
+
+    value = headers.get('retry-after-ms')
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+
+    value = headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    # HTTP-date form
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def is_retryable(exc: Exception) -> bool:
+    """Whether a failed request is worth retrying"""
+    status = status_code(exc)
+    if status in RETRYABLE_STATUS:
+        return True
+    # BigQuery reports quota/concurrency limits as 403 rateLimitExceeded
+    if status == 403 and 'rateLimitExceeded' in str(exc):
+        return True
+    return status is None and any(cls.__name__ in CONNECTION_ERRORS for cls in type(exc).__mro__)
+
+
+def _is_rate_limit(exc: Exception) -> bool:
+    status = status_code(exc)
+    return status == 429 or (status == 403 and 'rateLimitExceeded' in str(exc))
+
+
+class TokenBucket:
+    """
+    Token bucket whose refill rate adapts to rate-limit responses.
+
+    A 429 halves the rate and pauses the bucket for the Retry-After delay,
+    so every caller sharing the provider backs off together; each success
+    recovers part of the configured rate.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.paused_until = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, deadline: float = None):
+        """Take one token, waiting for it; raises SchedulerBusy past the deadline"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            if deadline is not None and now + wait > deadline:
+                raise SchedulerBusy("Rate limit wait exceeds the queue timeout")
+            time.sleep(wait)
+
+    def throttle(self, pause: float = 0.0):
+        """Back off after a rate-limit response"""
+        with self._lock:
+            now = time.monotonic()
+            self.rate = max(self.max_rate * MIN_RATE_FRACTION, self.rate / 2)
+            self.tokens = 0.0
+            self._updated = now
+            self.paused_until = max(self.paused_until, now + pause)
+
+    def recover(self):
+        """Creep back towards the configured rate after a success"""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * RATE_RECOVERY_STEP)
+
+
+class _Lane:
+    """Rate limit, concurrency cap and wait queue for one provider"""
+
+    def __init__(self, name: str, rate: float = None, burst: int = 1, max_concurrent: int = None):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.slots = threading.BoundedSemaphore(max_concurrent) if max_concurrent else None
+        self.waiting = 0
+        self._lock = threading.Lock()
+
+
+class RequestScheduler:
+    """
+    Runs provider calls under per-provider limits.
+
+    Each call waits for a concurrency slot (rejecting new callers with
+    SchedulerBusy once Config.SCHEDULER_MAX_QUEUED are already waiting) and
+    a rate-limit token, then is retried with jittered exponential backoff on
+    rate limits, server errors and dropped connections, honouring any
+    Retry-After the provider sends.
+    """
+
+    def __init__(self, limits: dict = None):
+        self.limits = dict(Config.SCHEDULER_LIMITS if limits is None else limits)
+        self._lanes = {}
+        self._lock = threading.Lock()
+
+    def _lane(self, provider: str) -> _Lane:
+        with self._lock:
+            if provider not in self._lanes:
+                self._lanes[provider] = _Lane(provider, **self.limits.get(provider, {}))
+            return self._lanes[provider]
+
+    def configure(self, provider: str, **limits):
+        """Replace a provider's limits (rate, burst, max_concurrent); None disables one"""
+        with self._lock:
+            self.limits[provider] = limits
+            self._lanes.pop(provider, None)
+
+    @contextmanager
+    def slot(self, provider: str):
+        """Hold one of the provider's concurrency slots for the enclosed block"""
+        lane = self._lane(provider)
+        if lane.slots is None:
+            yield
+            return
+
+        if not lane.slots.acquire(blocking=False):
+            with lane._lock:
+                if lane.waiting >= Config.SCHEDULER_MAX_QUEUED:
+                    raise SchedulerBusy(
+                        f"{provider} is busy ({lane.waiting} requests already queued); try again shortly"
+                    )
+                lane.waiting += 1
+            try:
+                with tracer.span("scheduler.queue", provider=provider):
+                    acquired = lane.slots.acquire(timeout=Config.SCHEDULER_QUEUE_TIMEOUT)
+            finally:
+                with lane._lock:
+                    lane.waiting -= 1
+            if not acquired:
+                raise SchedulerBusy(
+                    f"{provider} is busy: no free slot after {Config.SCHEDULER_QUEUE_TIMEOUT:g}s; try again shortly"
+                )
+        try:
+            yield
+        finally:
+            lane.slots.release()
+
+    def call(self, provider: str, fn, *args, **kwargs):
+        """
+        Run fn(*args, **kwargs) under the provider's limits, retrying transient failures
+
+        Args:
+            provider: Limits key ('anthropic', 'gemini', 'bigquery', ...)
+            fn: The request to make
+
+        Returns:
+            Whatever fn returns
+
+        Raises:
+            SchedulerBusy: The provider's queue is full or the wait timed out
+            Exception: fn's error once it is not retryable or attempts run out
+        """
+        lane = self._lane(provider)
+        with self.slot(provider):
+            attempt = 0
+            while True:
+                if lane.bucket:
+                    lane.bucket.acquire(deadline=time.monotonic() + Config.SCHEDULER_QUEUE_TIMEOUT)
+                try:
+                    result = fn(*args, **kwargs)
+                except Exception as e:
+                    attempt += 1
+                    if attempt >= Config.RETRY_MAX_ATTEMPTS or not is_retryable(e):
+                        raise
+                    delay = self._backoff(lane, e, attempt)
+                    with tracer.span("scheduler.backoff", provider=provider, attempt=attempt,
+                                     status=status_code(e), delay=round(delay, 3)):
+                        time.sleep(delay)
+                    continue
+                if lane.bucket:
+                    lane.bucket.recover()
+                return result
+
+    def _backoff(self, lane: _Lane, exc: Exception, attempt: int) -> float:
+        """Delay before the next attempt: Retry-After if given, else full-jitter exponential"""
+        delay = random.uniform(0, min(Config.RETRY_MAX_DELAY, Config.RETRY_BASE_DELAY * 2 ** attempt))
+        server_delay = retry_after(exc)
+        if server_delay is not None:
+            delay = server_delay + random.uniform(0, Config.RETRY_BASE_DELAY)
+        if lane.bucket and _is_rate_limit(exc):
+            lane.bucket.throttle(delay)
+        return delay
+
+
+# Process-wide scheduler shared by the LLM client and tools
+scheduler = RequestScheduler()
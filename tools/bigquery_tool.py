@@ -4,13 +4,21 @@ Queries NOAA weather data from BigQuery and exports to CSV
 """
 
 from google.cloud import bigquery
+from datetime import date
 from pathlib import Path
 import sys
 import os
+import contextvars
+import threading
 
 # Add parent directory to path to import config
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from config import Config
+from tracing import tracer
+from scheduler import scheduler
+from tools.result_schema import compact_dataframe, MISSING_SENTINELS
+from tools.result_summary import summarize_result
+from tools.query_jobs import run_query_job, QueryCancelled, QueryTimeout
 
 # Valid metric fields (numeric values that can be aggregated)
 VALID_METRICS = ['temp', 'max', 'min', 'prcp', 'wdsp', 'dewp', 'slp', 'sndp']
@@ -18,8 +26,39 @@ VALID_METRICS = ['temp', 'max', 'min', 'prcp', 'wdsp', 'dewp', 'slp', 'sndp']
 # Dimension fields (grouping attributes)
 DIMENSION_FIELDS = ['country', 'state', 'stn', 'name']
 
+# Quantile aggregations (name -> percentile)
+QUANTILE_AGGREGATIONS = {'median': 50, 'p10': 10, 'p25': 25, 'p75': 75, 'p90': 90, 'p95': 95, 'p99': 99}
 
-def execute_bigquery_query(
+# Valid metric aggregation functions
+METRIC_AGGREGATIONS = ['avg', 'min', 'max', 'stddev'] + list(QUANTILE_AGGREGATIONS)
+
+# Shared client, created lazily by get_bigquery_client()
+_client = None
+
+
+def get_bigquery_client():
+    """
+    Return the shared BigQuery client, creating it on first use.
+    Reusing one client avoids re-resolving credentials on every query.
+    """
+    global _client
+    if _client is None:
+        _client = bigquery.Client()
+    return _client
+
+
+def set_bigquery_client(client):
+    """
+    Replace the shared BigQuery client (e.g. with a local stand-in for
+    benchmarks). Any object exposing query(sql, job_config=...) returning a
+    job with job_id, done(), cancel() and result().to_dataframe() works.
+    Pass None to fall back to a real bigquery.Client on next use.
+    """
+    global _client
+    _client = client
+
+
+def build_query(
     start_date: str,
     end_date: str,
     metrics: list,
@@ -28,197 +67,470 @@ def execute_bigquery_query(
     station_id: str = None,
     aggregation: str = "none",
     metric_aggregation: str = "avg",
-    output_filename: str = "weather_data.csv"
-) -> dict:
+    approximate: bool = False,
+    sample_percent: float = None
+) -> str:
     """
-    Execute BigQuery query against NOAA GSOD 2024 dataset
+    Build the SQL for a GSOD query
 
     Args:
-        start_date: Start date in YYYY-MM-DD format
-        end_date: End date in YYYY-MM-DD format
-        metrics: List of metrics to retrieve (temp, max, min, prcp, wdsp, dewp, slp, sndp)
-        country: Two-letter country code (optional)
-        state: Two-letter state code (optional)
-        station_id: Specific weather station ID (optional)
-        aggregation: Date aggregation type (daily, weekly, monthly, none)
-        metric_aggregation: Metric aggregation function (avg, min, max)
-        output_filename: Name of output CSV file
+        See execute_bigquery_query
 
     Returns:
-        dict: Result dictionary with success status, message, and file path
+        str: BigQuery Standard SQL query
+
+    Raises:
+        ValueError: If a metric is not in VALID_METRICS or the dates are invalid
+    """
+    start, end = _parse_date_range(start_date, end_date)
+    table_path, suffix_condition = _resolve_tables(start, end)
+    table_clause = f"`{table_path}` g"
+
+    # Determine if we need to join with stations table
+    needs_station_join = country or state or station_id
+
+    # Determine if we should include dimensional breakdown
+    # Only include dimensions if: no aggregation (raw data) OR filtering by specific station
+    include_dimensions = aggregation.lower() == "none" or station_id
+
+    # Build SELECT clause
+    select_fields = []
+
+    # Add date field based on query type:
+    # - Time-based aggregation (daily/weekly/monthly): need date
+    # - Dimensional breakdown (raw data): need date
+    # - Overall aggregate (no dimensions): don't need date
+    if aggregation.lower() != "none" or include_dimensions or not needs_station_join:
+        select_fields.append("g.date")
+
+    # Add location fields only if we want dimensional breakdown
+    if needs_station_join and include_dimensions:
+        select_fields.extend(["g.stn as station_id", "s.name", "s.country", "s.state"])
+
+    # Add requested metrics with table alias
+    for metric in metrics:
+        if metric.lower() not in VALID_METRICS:
+            raise ValueError(f"Invalid metric: {metric}. Valid metrics: {', '.join(VALID_METRICS)}")
+        select_fields.append(f"g.{metric.lower()}")
+
+    # Build WHERE clause
+    # Use the parsed dates: fromisoformat also accepts forms like 20240101
+    # that BigQuery won't compare against a DATE
+    where_conditions = [f"g.date >= '{start.isoformat()}'", f"g.date <= '{end.isoformat()}'"]
+    if suffix_condition:
+        where_conditions.insert(0, suffix_condition)
+
+    if country:
+        where_conditions.append(f"s.country = '{country.upper()}'")
+
+    if state:
+        where_conditions.append(f"s.state = '{state.upper()}'")
+
+    if station_id:
+        where_conditions.append(f"g.stn = '{station_id}'")
+
+    # Approximate mode: scan a sample of the table. TABLESAMPLE skips whole
+    # storage blocks (fewer bytes billed) but isn't available on wildcard
+    # tables, which fall back to a row filter.
+    approximate = approximate and _supports_sampling(aggregation, metric_aggregation, station_id)
+    if approximate:
+        sample_percent = _validate_sample_percent(sample_percent)
+        if suffix_condition:
+            where_conditions.append(f"RAND() < {sample_percent / 100}")
+        else:
+            table_clause += f" TABLESAMPLE SYSTEM ({sample_percent} PERCENT)"
+
+    # Build aggregation and GROUP BY clause
+    group_by_clause = ""
+    order_by_field = "g.date" if select_fields and "g.date" in str(select_fields[0]) else None
+
+    # Determine if we should apply aggregation functions to metrics
+    # Apply aggregation if we're grouping by dimensions or if it's an overall aggregate
+    should_aggregate_metrics = not include_dimensions
+
+    if should_aggregate_metrics:
+        # Determine aggregation function
+        agg_func = metric_aggregation.lower()
+        if agg_func not in METRIC_AGGREGATIONS:
+            agg_func = 'avg'  # Default to AVG if invalid
+
+        # Apply aggregation functions to all metrics
+        error_fields = []
+        for i, field in enumerate(select_fields):
+            # Check if this field is a metric (contains g.metric_name)
+            for metric in VALID_METRICS:
+                if field == f"g.{metric}":
+                    # GSOD stores missing values as sentinel codes (9999.9 etc.);
+                    # NULL them so aggregates skip them instead of averaging them in
+                    column = f"NULLIF(g.{metric}, {MISSING_SENTINELS[metric]})"
+                    select_fields[i] = f"{_aggregate_expression(agg_func, column, approximate)} as {metric}"
+                    # 95% confidence margin of a sampled mean
+                    if approximate and agg_func == 'avg':
+                        error_fields.append(f"1.96 * STDDEV({column}) / SQRT(COUNT({column})) as {metric}_error_95")
+                    break
+
+        if approximate:
+            select_fields.extend(error_fields)
+            select_fields.extend(["COUNT(*) as sample_rows", "APPROX_COUNT_DISTINCT(g.stn) as station_count"])
+
+        # Build GROUP BY clause only if we have dimensional fields
+        group_by_fields = []
+
+        # Check if we're doing time-based aggregation
+        if aggregation.lower() in ["daily", "weekly", "monthly"]:
+            # Apply date truncation for weekly/monthly aggregation
+            if aggregation.lower() == "weekly":
+                # Update the date field in select_fields
+                for i, field in enumerate(select_fields):
+                    if "g.date" in field:
+                        select_fields[i] = "DATE_TRUNC(g.date, WEEK) as date"
+                        break
+            elif aggregation.lower() == "monthly":
+                for i, field in enumerate(select_fields):
+                    if "g.date" in field:
+                        select_fields[i] = "DATE_TRUNC(g.date, MONTH) as date"
+                        break
+            else:  # daily
+                for i, field in enumerate(select_fields):
+                    if "g.date" in field:
+                        select_fields[i] = "g.date as date"
+                        break
+
+            group_by_fields.append("date")
+            order_by_field = "date"
+
+        # Add location dimensions to GROUP BY if they're in the select
+        if include_dimensions and needs_station_join:
+            for i, field in enumerate(select_fields):
+                if "g.date" in field:
+                    select_fields[i] = "g.date as date"
+                    break
+            if "date" not in group_by_fields:
+                group_by_fields.append("date")
+            group_by_fields.extend(["g.stn", "s.name", "s.country", "s.state"])
+            if not order_by_field:
+                order_by_field = "date"
+
+        if group_by_fields:
+            group_by_clause = f"\nGROUP BY {', '.join(group_by_fields)}"
+
+    # Build ORDER BY clause
+    order_by_clause = ""
+    if order_by_field:
+        order_by_clause = f"\nORDER BY\n            {order_by_field}"
+
+    # Build final query
+    if needs_station_join:
+        query = f"""
+    SELECT
+        {', '.join(select_fields)}
+    FROM
+        {table_clause}
+    JOIN
+        `bigquery-public-data.noaa_gsod.stations` s
+    ON
+        g.stn = s.usaf AND g.wban = s.wban
+    WHERE
+        {' AND '.join(where_conditions)}
+    {group_by_clause}{order_by_clause}
+    LIMIT {Config.MAX_QUERY_ROWS}
+    """
+    else:
+        query = f"""
+    SELECT
+        {', '.join(select_fields)}
+    FROM
+        {table_clause}
+    WHERE
+        {' AND '.join(where_conditions)}
+    {group_by_clause}{order_by_clause}
+    LIMIT {Config.MAX_QUERY_ROWS}
+    """
+
+    return query
+
+
+def _aggregate_expression(agg_func: str, column: str, approximate: bool) -> str:
+    """
+    SQL aggregate for one metric column
+
+    Quantiles are exact (nearest rank over the sorted group) unless
+    approximate, where APPROX_QUANTILES avoids sorting every value.
+    """
+    if agg_func in QUANTILE_AGGREGATIONS:
+        percentile = QUANTILE_AGGREGATIONS[agg_func]
+        if approximate:
+            return f"APPROX_QUANTILES({column}, 100)[OFFSET({percentile})]"
+        return (
+            f"ARRAY_AGG({column} IGNORE NULLS ORDER BY {column})"
+            f"[SAFE_OFFSET(CAST(FLOOR((COUNT({column}) - 1) * {percentile / 100}) AS INT64))]"
+        )
+    return f"{agg_func.upper()}({column})"
+
+
+def _supports_sampling(aggregation: str, metric_aggregation: str, station_id: str = None) -> bool:
+    """
+    Whether a sample gives a meaningful estimate for a query. Raw rows from
+    a sample are just an incomplete result, and a sample's MIN/MAX can miss
+    the true extreme, so those run exactly even in approximate mode.
+    """
+    raw_rows = aggregation.lower() == "none" or station_id
+    return not raw_rows and metric_aggregation.lower() not in ('min', 'max')
+
+
+def _validate_sample_percent(sample_percent) -> float:
     """
+    Sample size for approximate mode, defaulting to Config.APPROX_SAMPLE_PERCENT
 
+    Raises:
+        ValueError: If sample_percent is not in (0, 100]
+    """
+    if sample_percent is None:
+        return float(Config.APPROX_SAMPLE_PERCENT)
     try:
-        # Initialize BigQuery client
-        client = bigquery.Client()
+        sample_percent = float(sample_percent)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid sample_percent: {sample_percent}. It must be a number between 0 and 100")
+    if not 0 < sample_percent <= 100:
+        raise ValueError(f"Invalid sample_percent: {sample_percent:g}. It must be greater than 0 and at most 100")
+    return sample_percent
 
-        # Determine if we need to join with stations table
-        needs_station_join = country or state or station_id
 
-        # Determine if we should include dimensional breakdown
-        # Only include dimensions if: no aggregation (raw data) OR filtering by specific station
-        include_dimensions = aggregation.lower() == "none" or station_id
+def _describe_estimate(df, sample_percent: float, output_filename: str) -> str:
+    """Result message for an approximate query"""
+    message = f"Approximate result from a ~{sample_percent:g}% sample: {len(df)} rows saved to {output_filename}."
+    if any(column.endswith("_error_95") for column in df.columns):
+        message += " Columns ending in _error_95 hold the 95% confidence margin of each average."
+    return message
 
-        # Build SELECT clause
-        select_fields = []
 
-        # Add date field based on query type:
-        # - Time-based aggregation (daily/weekly/monthly): need date
-        # - Dimensional breakdown (raw data): need date
-        # - Overall aggregate (no dimensions): don't need date
-        if aggregation.lower() != "none" or include_dimensions or not needs_station_join:
-            select_fields.append("g.date")
+def _describe_empty_sample(sample_percent: float) -> str:
+    """Result message for an approximate query whose sample held no matching rows"""
+    message = f"The ~{sample_percent:g}% sample contained no rows matching the criteria. "
+    if sample_percent < 100:
+        message += "Retry with a larger sample_percent (up to 100) or with approximate=false."
+    else:
+        message += f"Check date range (GSOD covers {Config.GSOD_FIRST_YEAR} to present) and location codes."
+    return message
 
-        # Add location fields only if we want dimensional breakdown
-        if needs_station_join and include_dimensions:
-            select_fields.extend(["g.stn as station_id", "s.name", "s.country", "s.state"])
 
-        # Add requested metrics with table alias
-        for metric in metrics:
-            if metric.lower() not in VALID_METRICS:
-                return {
-                    "success": False,
-                    "message": f"Invalid metric: {metric}. Valid metrics: {', '.join(VALID_METRICS)}",
-                    "file_path": None
-                }
-            select_fields.append(f"g.{metric.lower()}")
+def _parse_date_range(start_date: str, end_date: str) -> tuple:
+    """
+    Validate a query date range
 
-        # Build WHERE clause
-        where_conditions = [f"g.date >= '{start_date}'", f"g.date <= '{end_date}'"]
+    Returns:
+        tuple: (start date, end date)
 
-        if country:
-            where_conditions.append(f"s.country = '{country.upper()}'")
+    Raises:
+        ValueError: If a date is malformed, the range is reversed, or it lies
+            entirely outside the years GSOD has tables for
+    """
+    try:
+        start, end = date.fromisoformat(start_date), date.fromisoformat(end_date)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid date range: {start_date} to {end_date}. Dates must be in YYYY-MM-DD format")
 
-        if state:
-            where_conditions.append(f"s.state = '{state.upper()}'")
+    if end < start:
+        raise ValueError(f"Invalid date range: end_date {end_date} is before start_date {start_date}")
 
-        if station_id:
-            where_conditions.append(f"g.stn = '{station_id}'")
+    if end.year < Config.GSOD_FIRST_YEAR:
+        raise ValueError(f"Invalid date range: GSOD data starts in {Config.GSOD_FIRST_YEAR}")
 
-        # Build aggregation and GROUP BY clause
-        group_by_clause = ""
-        order_by_field = "g.date" if select_fields and "g.date" in str(select_fields[0]) else None
+    if start > date.today():
+        raise ValueError(f"Invalid date range: {start.isoformat()} is in the future. GSOD has data up to today")
 
-        # Determine if we should apply aggregation functions to metrics
-        # Apply aggregation if we're grouping by dimensions or if it's an overall aggregate
-        should_aggregate_metrics = not include_dimensions
+    return start, end
 
-        if should_aggregate_metrics:
-            # Determine aggregation function
-            agg_func = metric_aggregation.upper()
-            if agg_func not in ['AVG', 'MIN', 'MAX']:
-                agg_func = 'AVG'  # Default to AVG if invalid
 
-            # Apply aggregation functions to all metrics
-            for i, field in enumerate(select_fields):
-                # Check if this field is a metric (contains g.metric_name)
-                for metric in VALID_METRICS:
-                    if field == f"g.{metric}":
-                        select_fields[i] = f"{agg_func}(g.{metric}) as {metric}"
-                        break
+def _resolve_tables(start: date, end: date) -> tuple:
+    """
+    Pick the GSOD table(s) covering a validated date range
 
-            # Build GROUP BY clause only if we have dimensional fields
-            group_by_fields = []
-
-            # Check if we're doing time-based aggregation
-            if aggregation.lower() in ["daily", "weekly", "monthly"]:
-                # Apply date truncation for weekly/monthly aggregation
-                if aggregation.lower() == "weekly":
-                    # Update the date field in select_fields
-                    for i, field in enumerate(select_fields):
-                        if "g.date" in field:
-                            select_fields[i] = "DATE_TRUNC(g.date, WEEK) as date"
-                            break
-                elif aggregation.lower() == "monthly":
-                    for i, field in enumerate(select_fields):
-                        if "g.date" in field:
-                            select_fields[i] = "DATE_TRUNC(g.date, MONTH) as date"
-                            break
-                else:  # daily
-                    for i, field in enumerate(select_fields):
-                        if "g.date" in field:
-                            select_fields[i] = "g.date as date"
-                            break
+    A single-year range reads that year's table directly (wildcard queries
+    can't use BigQuery's result cache). Multi-year ranges use the gsod*
+    wildcard with a _TABLE_SUFFIX filter so only the needed years are scanned.
+    Years after the current one have no table yet and are left out.
 
-                group_by_fields.append("date")
-                order_by_field = "date"
+    Returns:
+        tuple: (table path, _TABLE_SUFFIX condition or None)
+    """
+    first_year = max(start.year, Config.GSOD_FIRST_YEAR)
+    last_year = min(end.year, date.today().year)
+
+    if first_year == last_year:
+        return Config.get_bigquery_table_path(first_year), None
+
+    return (
+        Config.get_bigquery_table_path(),
+        f"_TABLE_SUFFIX BETWEEN '{first_year}' AND '{last_year}'"
+    )
 
-            # Add location dimensions to GROUP BY if they're in the select
-            if include_dimensions and needs_station_join:
-                for i, field in enumerate(select_fields):
-                    if "g.date" in field:
-                        select_fields[i] = "g.date as date"
-                        break
-                if "date" not in group_by_fields:
-                    group_by_fields.append("date")
-                group_by_fields.extend(["g.stn", "s.name", "s.country", "s.state"])
-                if not order_by_field:
-                    order_by_field = "date"
-
-            if group_by_fields:
-                group_by_clause = f"\nGROUP BY {', '.join(group_by_fields)}"
-
-        # Build ORDER BY clause
-        order_by_clause = ""
-        if order_by_field:
-            order_by_clause = f"\nORDER BY\n            {order_by_field}"
-
-        # Build final query
-        if needs_station_join:
-            query = f"""
-        SELECT
-            {', '.join(select_fields)}
-        FROM
-            `{Config.get_bigquery_table_path()}` g
-        JOIN
-            `bigquery-public-data.noaa_gsod.stations` s
-        ON
-            g.stn = s.usaf AND g.wban = s.wban
-        WHERE
-            {' AND '.join(where_conditions)}
-        {group_by_clause}{order_by_clause}
-        LIMIT {Config.MAX_QUERY_ROWS}
-        """
-        else:
-            query = f"""
-        SELECT
-            {', '.join(select_fields)}
-        FROM
-            `{Config.get_bigquery_table_path()}` g
-        WHERE
-            {' AND '.join(where_conditions)}
-        {group_by_clause}{order_by_clause}
-        LIMIT {Config.MAX_QUERY_ROWS}
-        """
+
+def execute_bigquery_query(
+    start_date: str,
+    end_date: str,
+    metrics: list,
+    country: str = None,
+    state: str = None,
+    station_id: str = None,
+    aggregation: str = "none",
+    metric_aggregation: str = "avg",
+    output_filename: str = "weather_data.csv",
+    approximate: bool = False,
+    sample_percent: float = None,
+    refine_in_background: bool = False,
+    timeout_seconds: float = None
+) -> dict:
+    """
+    Execute BigQuery query against the NOAA GSOD dataset (any years)
+
+    Args:
+        start_date: Start date in YYYY-MM-DD format
+        end_date: End date in YYYY-MM-DD format
+        metrics: List of metrics to retrieve (temp, max, min, prcp, wdsp, dewp, slp, sndp)
+        country: Two-letter country code (optional)
+        state: Two-letter state code (optional)
+        station_id: Specific weather station ID (optional)
+        aggregation: Date aggregation type (daily, weekly, monthly, none)
+        metric_aggregation: Metric aggregation function (avg, min, max, stddev,
+            median, p10, p25, p75, p90, p95, p99)
+        output_filename: Name of output CSV file
+        approximate: Scan a sample of the table for a fast estimate. Averages
+            get a <metric>_error_95 column with the 95% confidence margin.
+            Raw-row (aggregation none or station_id) and min/max queries
+            always run exactly.
+        sample_percent: Share of the table to sample in approximate mode
+            (default Config.APPROX_SAMPLE_PERCENT)
+        refine_in_background: In approximate mode, also run the exact query
+            in a background thread and save it to <output>_exact.csv
+        timeout_seconds: Cancel the job if it runs longer than this
+            (default Config.QUERY_TIMEOUT_SECONDS)
+
+    Returns:
+        dict: Result dictionary with success status, message, and file path
+    """
+
+    try:
+        timings = {}
+
+        # Build query
+        with tracer.span("bigquery.sql_build") as span:
+            try:
+                # Validated once here, so the messages below get the same float the query used
+                if approximate:
+                    sample_percent = _validate_sample_percent(sample_percent)
+                run_exactly = approximate and not _supports_sampling(aggregation, metric_aggregation, station_id)
+                approximate = approximate and not run_exactly
+                query = build_query(
+                    start_date, end_date, metrics,
+                    country=country, state=state, station_id=station_id,
+                    aggregation=aggregation, metric_aggregation=metric_aggregation,
+                    approximate=approximate, sample_percent=sample_percent
+                )
+            except ValueError as e:
+                return {
+                    "success": False,
+                    "message": str(e),
+                    "file_path": None
+                }
+        timings["sql_build"] = span.duration
 
         print(f"Executing query:\n{query}\n")
 
         # Execute query
-        query_job = client.query(query)
-        results = query_job.result()
+        with tracer.span("bigquery.job", approximate=bool(approximate)) as job_span:
+            # The scheduler holds a BigQuery slot for the whole job and
+            # resubmits it on rate limits and backend errors
+            query_job, results = scheduler.call(
+                "bigquery", run_query_job, get_bigquery_client(), query, timeout=timeout_seconds
+            )
+            job_span.set_attribute("job_id", getattr(query_job, "job_id", None))
+            job_span.set_attribute("bytes_processed", getattr(query_job, "total_bytes_processed", None))
+            job_span.set_attribute("cache_hit", getattr(query_job, "cache_hit", None))
 
         # Convert to dataframe
-        df = results.to_dataframe()
+        with tracer.span("bigquery.download") as download_span:
+            df, memory = compact_dataframe(results.to_dataframe())
+            download_span.set_attribute("rows_returned", len(df))
+            download_span.set_attribute("memory_bytes", memory["bytes"])
+        timings["query"] = job_span.duration + download_span.duration
+
+        # An aggregate over an empty sample still returns a row, with sample_rows 0
+        if approximate and (df.empty or ("sample_rows" in df.columns and not df["sample_rows"].sum())):
+            return {
+                "success": False,
+                "message": _describe_empty_sample(sample_percent),
+                "file_path": None
+            }
 
         if df.empty:
             return {
                 "success": False,
-                "message": f"No data found for the specified criteria. Check date range (must be within 2024) and location codes.",
+                "message": f"No data found for the specified criteria. Check date range (GSOD covers {Config.GSOD_FIRST_YEAR} to present) and location codes.",
                 "file_path": None
             }
 
         # Save to CSV
-        output_path = Config.OUTPUT_DIR / output_filename
-        df.to_csv(output_path, index=False)
-
-        return {
+        with tracer.span("bigquery.csv_write", rows=len(df)) as span:
+            output_path = Config.OUTPUT_DIR / output_filename
+            df.to_csv(output_path, index=False)
+        timings["export"] = span.duration
+
+        # Summarize for the LLM so it can answer without another tool call
+        with tracer.span("bigquery.summarize", rows=len(df)) as span:
+            summary = summarize_result(df)
+            span.set_attribute("summary_chars", len(summary))
+        timings["summarize"] = span.duration
+
+        result = {
             "success": True,
             "message": f"Successfully retrieved {len(df)} rows of data. Saved to {output_filename}",
             "file_path": str(output_path),
             "row_count": len(df),
-            "columns": list(df.columns)
+            "columns": list(df.columns),
+            "summary": summary,
+            "timings": timings,
+            "memory": memory
         }
 
+        if approximate:
+            result["message"] = _describe_estimate(df, sample_percent, output_filename)
+            if refine_in_background:
+                exact_filename = f"{Path(output_filename).stem}_exact.csv"
+                # Run in a copy of this context so the exact job joins the
+                # caller's cancellation scope (an interrupted turn cancels it too)
+                threading.Thread(
+                    target=contextvars.copy_context().run,
+                    args=(execute_bigquery_query,),
+                    kwargs=dict(
+                        start_date=start_date, end_date=end_date, metrics=metrics,
+                        country=country, state=state, station_id=station_id,
+                        aggregation=aggregation, metric_aggregation=metric_aggregation,
+                        output_filename=exact_filename, timeout_seconds=timeout_seconds
+                    ),
+                    name=f"refine-{exact_filename}",
+                    daemon=True
+                ).start()
+                result["exact_file_path"] = str(Config.OUTPUT_DIR / exact_filename)
+                result["message"] += f" The exact result is being computed in the background and will be saved to {exact_filename}."
+
+        if run_exactly:
+            result["message"] += (
+                " Approximate mode was not used: a sample can't give complete raw rows"
+                " or reliable min/max values, so the query ran exactly."
+            )
+
+        if len(df) >= Config.MAX_QUERY_ROWS:
+            result["message"] += f" The result hit the {Config.MAX_QUERY_ROWS}-row limit, so it may be incomplete."
+        result["message"] += f"\n{summary}"
+        return result
+
+    except (QueryTimeout, QueryCancelled) as e:
+        return {
+            "success": False,
+            "message": str(e),
+            "file_path": None
+        }
     except Exception as e:
         return {
             "success": False,
@@ -0,0 +1,243 @@
+"""
+Query Jobs
+Managed BigQuery jobs: a deadline per job, polling with backoff instead of a
+blocking result(), cooperative cancellation, and a registry of running and
+recently finished jobs
+"""
+
+import contextvars
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+import sys
+
+from google.cloud import bigquery
+
+# Add parent directory to path to import config
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config import Config
+
+
+class QueryCancelled(Exception):
+    """The job was cancelled before it finished"""
+
+
+class QueryTimeout(Exception):
+    """The job ran past its deadline and was cancelled"""
+
+
+class CancellationScope:
+    """
+    Group of jobs that are cancelled together.
+
+    The orchestrator opens one scope per agent turn; every job submitted
+    while the scope is current belongs to it. Cancelling the scope (an
+    interrupted turn, a failed sibling tool call) cancels its running jobs
+    and makes any job still polling stop at its next check.
+    """
+
+    def __init__(self, name: str = None):
+        self.name = name
+        self.reason = None
+        self._event = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled") -> int:
+        """Cancel the scope and its running jobs; returns how many jobs were cancelled"""
+        if not self.cancelled:
+            self.reason = reason
+            self._event.set()
+        return registry.cancel_scope(self, reason)
+
+    def check(self):
+        """Raise QueryCancelled if the scope has been cancelled"""
+        if self.cancelled:
+            raise QueryCancelled(f"Query cancelled ({self.reason})")
+
+
+_current_scope = contextvars.ContextVar('query_cancellation_scope', default=None)
+
+
+def current_scope() -> CancellationScope:
+    """The scope jobs submitted from this context belong to, if any"""
+    return _current_scope.get()
+
+
+@contextmanager
+def cancellation_scope(name: str = None, scope: CancellationScope = None):
+    """
+    Make a scope current for the enclosed block
+
+    Usage:
+        with cancellation_scope("turn") as scope:
+            ...
+            scope.cancel("interrupted")
+    """
+    scope = scope or CancellationScope(name)
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(token)
+
+
+class JobRecord:
+    """Registry entry for one submitted job"""
+
+    def __init__(self, job, sql: str, scope: CancellationScope, timeout: float):
+        self.job = job
+        self.job_id = getattr(job, "job_id", None) or f"local-{id(job):x}"
+        self.sql = sql
+        self.scope = scope
+        self.timeout = timeout
+        self.state = "running"
+        self.error = None
+        self.cancel_reason = None
+        self.started = time.time()
+        self.finished = None
+
+    def to_dict(self) -> dict:
+        end = self.finished or time.time()
+        return {
+            "job_id": self.job_id,
+            "state": self.state,
+            "scope": self.scope.name if self.scope else None,
+            "elapsed": end - self.started,
+            "timeout": self.timeout,
+            "bytes_processed": getattr(self.job, "total_bytes_processed", None),
+            "error": self.error,
+        }
+
+
+class QueryJobRegistry:
+    """Thread-safe registry of running and recently finished jobs"""
+
+    def __init__(self, history: int = None):
+        self._lock = threading.Lock()
+        self._running = {}  # job_id -> JobRecord
+        self._finished = deque(maxlen=history or Config.QUERY_JOB_HISTORY)
+
+    def register(self, job, sql: str, scope: CancellationScope, timeout: float) -> JobRecord:
+        record = JobRecord(job, sql, scope, timeout)
+        with self._lock:
+            self._running[record.job_id] = record
+        return record
+
+    def finish(self, record: JobRecord, state: str, error: str = None):
+        with self._lock:
+            record.state = state
+            record.error = error
+            record.finished = time.time()
+            self._running.pop(record.job_id, None)
+            self._finished.append(record)
+
+    def running(self) -> list:
+        """Records of jobs that have not finished"""
+        with self._lock:
+            return list(self._running.values())
+
+    def jobs(self) -> list:
+        """Running jobs followed by recently finished ones, as dicts"""
+        with self._lock:
+            records = list(self._running.values()) + list(reversed(self._finished))
+        return [record.to_dict() for record in records]
+
+    def cancel(self, job_id: str, reason: str = "cancelled") -> bool:
+        """Request cancellation of a running job"""
+        with self._lock:
+            record = self._running.get(job_id)
+        return self._cancel(record, reason) if record else False
+
+    def cancel_scope(self, scope: CancellationScope, reason: str = "cancelled") -> int:
+        """Cancel every running job in a scope"""
+        return sum(self._cancel(record, reason) for record in self.running() if record.scope is scope)
+
+    def cancel_all(self, reason: str = "shutdown") -> int:
+        """Cancel every running job (e.g. when the agent exits)"""
+        return sum(self._cancel(record, reason) for record in self.running())
+
+    def _cancel(self, record: JobRecord, reason: str) -> bool:
+        if record.cancel_reason:
+            return False
+        record.cancel_reason = reason
+        try:
+            record.job.cancel()
+        except Exception as e:
+            record.error = f"cancel failed: {e}"
+        return True
+
+
+# Process-wide registry used by the query tool and orchestrator
+registry = QueryJobRegistry()
+
+
+def run_query_job(client, sql: str, timeout: float = None):
+    """
+    Submit a query and wait for it without blocking on result()
+
+    The job is polled with exponential backoff until it finishes, its
+    deadline passes or its cancellation scope is cancelled. Any way out of
+    the wait other than success (timeout, cancellation, KeyboardInterrupt,
+    an error) cancels the job, so nothing keeps running and billing after
+    the caller has given up on it.
+
+    Args:
+        client: BigQuery client (or stand-in) exposing query(sql, job_config=...)
+        sql: Query to run
+        timeout: Seconds before the job is cancelled (default Config.QUERY_TIMEOUT_SECONDS)
+
+    Returns:
+        tuple: (job, RowIterator from job.result())
+
+    Raises:
+        QueryTimeout: The deadline passed
+        QueryCancelled: The job's scope or the registry cancelled it
+    """
+    timeout = float(timeout or Config.QUERY_TIMEOUT_SECONDS)
+    scope = current_scope()
+    if scope:
+        scope.check()
+
+    # Server-side limit as well, in case this process dies mid-poll
+    job_config = bigquery.QueryJobConfig(job_timeout_ms=int(timeout * 1000))
+    job = client.query(sql, job_config=job_config)
+    record = registry.register(job, sql, scope, timeout)
+
+    deadline = time.monotonic() + timeout
+    delay = Config.QUERY_POLL_INITIAL_SECONDS
+    job_done = False
+    try:
+        while not job.done():
+            if scope:
+                scope.check()
+            if record.cancel_reason:
+                raise QueryCancelled(f"Query cancelled ({record.cancel_reason})")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise QueryTimeout(f"Query exceeded the {timeout:g}s timeout and was cancelled")
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, Config.QUERY_POLL_MAX_SECONDS)
+        job_done = True
+
+        if record.cancel_reason:
+            raise QueryCancelled(f"Query cancelled ({record.cancel_reason})")
+        results = job.result()
+    except BaseException as e:
+        if isinstance(e, QueryTimeout):
+            state = "timed_out"
+        elif isinstance(e, (QueryCancelled, KeyboardInterrupt)) or record.cancel_reason:
+            state = "cancelled"
+        else:
+            state = "failed"
+        if not job_done and not record.cancel_reason:
+            registry._cancel(record, state)
+        registry.finish(record, state, str(e) or type(e).__name__)
+        raise
+
+    registry.finish(record, "done")
+    return job, results
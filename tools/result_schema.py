@@ -0,0 +1,112 @@
+"""
+Result Schema
+Compact in-memory representation for query results: float32 metrics with
+GSOD missing-value sentinels as NaN, categorical dimensions, datetime dates
+"""
+
+import csv
+
+import numpy as np
+import pandas as pd
+
+# GSOD "missing value" sentinels per metric (one entry per VALID_METRICS field)
+MISSING_SENTINELS = {
+    'temp': 9999.9,
+    'max': 9999.9,
+    'min': 9999.9,
+    'dewp': 9999.9,
+    'slp': 9999.9,
+    'wdsp': 999.9,
+    'sndp': 999.9,
+    'prcp': 99.99,
+}
+
+METRIC_COLUMNS = list(MISSING_SENTINELS)
+
+# Columns stored as pandas categoricals (few distinct values, many repeats)
+CATEGORICAL_COLUMNS = ['station_id', 'stn', 'wban', 'name', 'country', 'state']
+
+DATE_COLUMNS = ['date']
+
+
+def csv_dtypes(columns) -> dict:
+    """pd.read_csv dtype mapping for the known columns present in a CSV header"""
+    dtypes = {}
+    for column in columns:
+        if column in METRIC_COLUMNS:
+            dtypes[column] = 'float32'
+        elif column in CATEGORICAL_COLUMNS:
+            dtypes[column] = 'category'
+    return dtypes
+
+
+def read_result_csv(path) -> tuple:
+    """
+    Load a result CSV directly into the compact schema
+
+    Returns:
+        tuple: (DataFrame, memory report)
+    """
+    with open(path, newline='') as f:
+        columns = next(csv.reader(f), [])
+    df = pd.read_csv(
+        path,
+        dtype=csv_dtypes(columns),
+        parse_dates=[c for c in DATE_COLUMNS if c in columns]
+    )
+    df, _ = compact_dataframe(df)
+    return df, memory_report(df)
+
+
+def compact_dataframe(df: pd.DataFrame) -> tuple:
+    """
+    Convert a result DataFrame to the compact schema
+
+    - GSOD metrics -> float32, missing-value sentinels -> NaN
+    - other float columns (error bounds etc.) -> float32
+    - integer columns -> smallest integer type that fits
+    - station/location dimensions -> category
+    - date -> datetime64
+
+    Returns:
+        tuple: (DataFrame, memory report from memory_report)
+    """
+    bytes_before = int(df.memory_usage(index=False, deep=True).sum())
+    df = df.copy(deep=False)
+
+    for column in df.columns:
+        series = df[column]
+        if column in METRIC_COLUMNS:
+            values = pd.to_numeric(series, errors='coerce').to_numpy(dtype=np.float32, copy=True)
+            values[values == np.float32(MISSING_SENTINELS[column])] = np.nan
+            df[column] = values
+        elif column in DATE_COLUMNS:
+            if not pd.api.types.is_datetime64_any_dtype(series):
+                df[column] = pd.to_datetime(series)
+        elif column in CATEGORICAL_COLUMNS:
+            if not isinstance(series.dtype, pd.CategoricalDtype):
+                df[column] = series.astype('category')
+        elif pd.api.types.is_float_dtype(series):
+            df[column] = series.astype(np.float32)
+        elif pd.api.types.is_integer_dtype(series):
+            df[column] = pd.to_numeric(series, downcast='integer')
+
+    return df, memory_report(df, bytes_before)
+
+
+def memory_report(df: pd.DataFrame, bytes_before: int = None) -> dict:
+    """
+    Per-dataset memory report
+
+    Returns:
+        dict: rows, total bytes, bytes before compaction (if known) and per-column dtype/bytes
+    """
+    usage = df.memory_usage(index=False, deep=True)
+    report = {
+        "rows": len(df),
+        "bytes": int(usage.sum()),
+        "columns": {column: {"dtype": str(df[column].dtype), "bytes": int(usage[column])} for column in df.columns},
+    }
+    if bytes_before is not None:
+        report["bytes_before"] = bytes_before
+    return report
@@ -0,0 +1,170 @@
+"""
+Result Summary
+Compact statistical digest of a query result for the LLM: per-column
+count/min/max/mean, where the extremes occurred, and the first/last rows,
+kept within a token budget so most questions can be answered without
+another tool call
+"""
+
+import warnings
+
+import numpy as np
+import pandas as pd
+from pathlib import Path
+import sys
+
+# Add parent directory to path to import config
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config import Config
+from tools.result_schema import METRIC_COLUMNS, DATE_COLUMNS
+
+# Rough characters per LLM token, used to estimate the size of a summary
+CHARS_PER_TOKEN = 4
+
+# Columns that identify where an extreme value was observed, in label order
+LOCATION_COLUMNS = ['station_id', 'name', 'state', 'country']
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of text"""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def summarize_result(df: pd.DataFrame, token_budget: int = None, sample_rows: int = None) -> str:
+    """
+    Summarize a result DataFrame within a token budget
+
+    Statistics for every numeric column are computed together over one
+    NumPy block. If the full summary is over budget, sample rows are
+    dropped first, then extremes, then trailing columns.
+
+    Args:
+        df: Query result (compact schema)
+        token_budget: Maximum estimated tokens (default Config.RESULT_SUMMARY_TOKENS)
+        sample_rows: Rows shown from each end (default Config.RESULT_SAMPLE_ROWS)
+
+    Returns:
+        str: Multi-line summary
+    """
+    token_budget = token_budget or Config.RESULT_SUMMARY_TOKENS
+    sample_rows = Config.RESULT_SAMPLE_ROWS if sample_rows is None else sample_rows
+
+    header = _describe_shape(df)
+
+    # Small results are cheaper to show whole than to summarize
+    if len(df) <= 2 * sample_rows:
+        text = f"{header}\n{_rows_csv(df)}"
+        if estimate_tokens(text) <= token_budget:
+            return text
+
+    stats = _column_stats(df)
+    for rows in range(sample_rows, -1, -1):
+        for with_extremes in (True, False):
+            if rows and not with_extremes:
+                continue
+            text = _render(header, stats, df, rows, with_extremes)
+            if estimate_tokens(text) <= token_budget:
+                return text
+
+    # Still too long: keep as many per-column lines as fit
+    lines = _render(header, stats, df, 0, False).splitlines()
+    text = lines[0]
+    for line in lines[1:]:
+        if estimate_tokens(f"{text}\n{line}\n...") > token_budget:
+            return f"{text}\n..."
+        text = f"{text}\n{line}"
+    return text
+
+
+def _describe_shape(df: pd.DataFrame) -> str:
+    """Row count, date span and number of stations"""
+    parts = [f"{len(df)} rows"]
+    for column in DATE_COLUMNS:
+        if column in df.columns and df[column].notna().any():
+            first, last = df[column].min(), df[column].max()
+            parts.append(f"{_format_value(first)} to {_format_value(last)}")
+    if 'station_id' in df.columns:
+        parts.append(f"{df['station_id'].nunique()} stations")
+    return f"Summary ({', '.join(parts)}):"
+
+
+def _column_stats(df: pd.DataFrame) -> list:
+    """
+    count/min/max/mean and the row positions of the extremes for every
+    numeric column, computed over a single 2-D array
+
+    Returns:
+        list: One dict per numeric column
+    """
+    columns = [c for c in df.columns if c not in DATE_COLUMNS and pd.api.types.is_numeric_dtype(df[c])]
+    if not columns:
+        return []
+
+    values = df[columns].to_numpy(dtype=np.float64, na_value=np.nan)
+    present = ~np.isnan(values)
+    counts = present.sum(axis=0)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        means = np.nansum(values, axis=0) / counts
+    min_rows = np.where(present, values, np.inf).argmin(axis=0)
+    max_rows = np.where(present, values, -np.inf).argmax(axis=0)
+
+    return [
+        {
+            "column": column,
+            "count": int(counts[i]),
+            "mean": means[i],
+            "min": values[min_rows[i], i],
+            "max": values[max_rows[i], i],
+            "min_row": int(min_rows[i]),
+            "max_row": int(max_rows[i]),
+        }
+        for i, column in enumerate(columns)
+    ]
+
+
+def _render(header: str, stats: list, df: pd.DataFrame, sample_rows: int, with_extremes: bool) -> str:
+    """Assemble the summary text"""
+    lines = [header]
+    for stat in stats:
+        if not stat["count"]:
+            lines.append(f"- {stat['column']}: no values")
+            continue
+        line = f"- {stat['column']}: mean {_format_value(stat['mean'])}"
+        if with_extremes and stat["column"] in METRIC_COLUMNS:
+            line += (f", min {_format_value(stat['min'])}{_locate(df, stat['min_row'])}"
+                     f", max {_format_value(stat['max'])}{_locate(df, stat['max_row'])}")
+        else:
+            line += f", min {_format_value(stat['min'])}, max {_format_value(stat['max'])}"
+        if stat["count"] < len(df):
+            line += f", {stat['count']} values"
+        lines.append(line)
+
+    if sample_rows:
+        lines.append(f"First {sample_rows} rows:")
+        lines.append(_rows_csv(df.head(sample_rows)))
+        lines.append(f"Last {sample_rows} rows:")
+        lines.append(_rows_csv(df.tail(sample_rows), header=False))
+    return "\n".join(lines)
+
+
+def _locate(df: pd.DataFrame, row: int) -> str:
+    """' (date, station)' for the row an extreme came from, or '' if the result has neither"""
+    labels = [_format_value(df[c].iat[row]) for c in DATE_COLUMNS if c in df.columns]
+    station = " ".join(str(df[c].iat[row]) for c in LOCATION_COLUMNS[:2] if c in df.columns and pd.notna(df[c].iat[row]))
+    if station:
+        labels.append(station)
+    return f" ({', '.join(labels)})" if labels else ""
+
+
+def _rows_csv(df: pd.DataFrame, header: bool = True) -> str:
+    """Rows as compact CSV"""
+    return df.to_csv(index=False, header=header, float_format='%.6g', date_format='%Y-%m-%d').strip()
+
+
+def _format_value(value) -> str:
+    if isinstance(value, pd.Timestamp):
+        return value.strftime('%Y-%m-%d')
+    if isinstance(value, (float, np.floating)):
+        return f"{float(value):.6g}"
+    return str(value)
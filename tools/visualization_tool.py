@@ -3,15 +3,29 @@ Visualization Tool
 Creates charts from CSV data files
 """
 
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
+from matplotlib.collections import PolyCollection
+from matplotlib.colors import to_rgba_array
+from matplotlib.patches import Patch
 from pathlib import Path
+import io
+import json
 import sys
 
 # Add parent directory to path to import config
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from config import Config
+from tracing import tracer
+from tools.result_schema import read_result_csv
 
+# Supported output formats and the file extension each one is written with
+OUTPUT_FORMATS = {
+    'png': '.png',
+    'svg': '.svg',
+    'json': '.json',
+}
 
 def create_visualization(
     csv_filepath: str,
@@ -19,7 +33,10 @@ def create_visualization(
     y_columns: list,
     chart_type: str = "auto",
     title: str = None,
-    output_filename: str = "visualization.png"
+    output_filename: str = "visualization.png",
+    output_format: str = "png",
+    output_buffer=None,
+    max_categories: int = None
 ) -> dict:
     """
     Create visualization from CSV data
@@ -30,13 +47,48 @@ def create_visualization(
         y_columns: List of column names for y-axis
         chart_type: Type of chart (line, bar, auto)
         title: Chart title
-        output_filename: Name of output PNG file
+        output_filename: Name of output file (extension follows output_format)
+        output_format: Output format (png, svg, json). 'json' skips rendering and
+            emits a lightweight series spec for client-side charting.
+        output_buffer: Optional writable binary file-like object (e.g.
+            io.BytesIO). When given, the chart is written there instead of to
+            Config.OUTPUT_DIR, as bytes for every output format.
+        max_categories: Bar charts only. Keep the top N categories (by the first
+            y column) and bucket the rest into "Other". Defaults to
+            Config.MAX_BAR_CATEGORIES; 0 disables bucketing.
 
     Returns:
         dict: Result dictionary with success status, message, and file path
     """
 
     try:
+        output_format = output_format.lower()
+        if output_format not in OUTPUT_FORMATS:
+            return {
+                "success": False,
+                "message": f"Invalid output format: {output_format}. Valid formats: {', '.join(OUTPUT_FORMATS)}",
+                "file_path": None
+            }
+
+        # Every format writes bytes, so text buffers are rejected up front
+        if isinstance(output_buffer, io.TextIOBase):
+            return {
+                "success": False,
+                "message": "Invalid output_buffer: it must be a binary file-like object (e.g. io.BytesIO), not a text stream",
+                "file_path": None
+            }
+
+        # Whole numbers only; Gemini sends integers as floats (10.0)
+        if max_categories is not None:
+            if (isinstance(max_categories, bool) or not isinstance(max_categories, (int, float))
+                    or not float(max_categories).is_integer() or max_categories < 0):
+                return {
+                    "success": False,
+                    "message": f"Invalid max_categories: {max_categories}. It must be a whole number, 0 or more (0 disables bucketing)",
+                    "file_path": None
+                }
+            max_categories = int(max_categories)
+
         # Check if CSV file exists
         csv_path = Path(csv_filepath)
         if not csv_path.exists():
@@ -50,7 +102,12 @@ def create_visualization(
                 }
 
         # Load CSV data
-        df = pd.read_csv(csv_path)
+        timings = {}
+        with tracer.span("visualization.load") as span:
+            df, memory = read_result_csv(csv_path)
+            span.set_attribute("rows", len(df))
+            span.set_attribute("memory_bytes", memory["bytes"])
+        timings["load"] = span.duration
 
         # Validate columns exist
         if x_column not in df.columns:
@@ -75,7 +132,8 @@ def create_visualization(
                 chart_type = "line"
             else:
                 # Check if x-column is categorical
-                if df[x_column].dtype == 'object' or df[x_column].nunique() < 20:
+                if (df[x_column].dtype == 'object' or isinstance(df[x_column].dtype, pd.CategoricalDtype)
+                        or df[x_column].nunique() < 20):
                     chart_type = "bar"
                 else:
                     chart_type = "line"
@@ -84,62 +142,226 @@ def create_visualization(
         if 'date' in x_column.lower():
             df[x_column] = pd.to_datetime(df[x_column])
 
-        # Create figure
-        plt.figure(figsize=(12, 6))
-
-        # Create chart based on type
-        if chart_type.lower() == "line":
-            for y_col in y_columns:
-                plt.plot(df[x_column], df[y_col], marker='o', label=y_col, linewidth=2)
-        elif chart_type.lower() == "bar":
-            if len(y_columns) == 1:
-                plt.bar(df[x_column], df[y_columns[0]], label=y_columns[0])
-            else:
-                # Multiple bars side by side
-                x_pos = range(len(df))
-                width = 0.8 / len(y_columns)
-                for i, y_col in enumerate(y_columns):
-                    offset = (i - len(y_columns)/2) * width + width/2
-                    plt.bar([x + offset for x in x_pos], df[y_col], width=width, label=y_col)
-                plt.xticks(x_pos, df[x_column])
-        else:
+        if chart_type.lower() not in ["line", "bar"]:
             return {
                 "success": False,
                 "message": f"Invalid chart type: {chart_type}. Valid types: line, bar, auto",
                 "file_path": None
             }
 
-        # Formatting
-        plt.xlabel(x_column.replace('_', ' ').title(), fontsize=12)
-        plt.ylabel('Value', fontsize=12)
-        plt.title(title or f"{', '.join(y_columns)} vs {x_column}", fontsize=14, fontweight='bold')
-        plt.grid(True, alpha=0.3)
+        chart_title = title or f"{', '.join(y_columns)} vs {x_column}"
+
+        with tracer.span("visualization.render", chart_type=chart_type.lower(), output_format=output_format) as span:
+            result = _render(
+                df, x_column, y_columns, chart_type, chart_title,
+                output_filename, output_format, output_buffer, max_categories
+            )
+        timings["render"] = span.duration
+        result["timings"] = timings
+        result["memory"] = memory
+        return result
+
+    except Exception as e:
+        return {
+            "success": False,
+            "message": f"Error creating visualization: {str(e)}",
+            "file_path": None
+        }
+
+
+def _render(df: pd.DataFrame, x_column: str, y_columns: list, chart_type: str, chart_title: str,
+            output_filename: str, output_format: str, output_buffer, max_categories: int) -> dict:
+    """Draw the chart (or build the JSON spec) and write it out"""
+    if chart_type.lower() == "bar":
+        if max_categories is None:
+            max_categories = Config.MAX_BAR_CATEGORIES
+        df = _bucket_categories(df, x_column, y_columns, max_categories)
+
+    # JSON series spec: no matplotlib rendering at all
+    if output_format == "json":
+        spec = _build_series_spec(df, x_column, y_columns, chart_type.lower(), chart_title)
+        return _write_output(
+            lambda f: f.write(json.dumps(spec).encode('utf-8')),
+            output_filename, output_format, output_buffer, chart_type
+        )
+
+    # Create figure
+    fig = plt.figure(figsize=(12, 6))
+
+    # Create chart based on type
+    if chart_type.lower() == "line":
+        for y_col in y_columns:
+            plt.plot(df[x_column], df[y_col], marker='o', label=y_col, linewidth=2)
+    elif chart_type.lower() == "bar":
+        _draw_bar_collection(plt.gca(), df, x_column, y_columns)
+
+    # Formatting
+    plt.xlabel(x_column.replace('_', ' ').title(), fontsize=12)
+    plt.ylabel('Value', fontsize=12)
+    plt.title(chart_title, fontsize=14, fontweight='bold')
+    plt.grid(True, alpha=0.3)
+    if chart_type.lower() == "line":
         plt.legend()
 
-        # Rotate x-labels if needed
-        if chart_type.lower() == "bar" or len(df) > 10:
-            plt.xticks(rotation=45, ha='right')
+    # Rotate x-labels if needed
+    if chart_type.lower() == "bar" or len(df) > 10:
+        plt.xticks(rotation=45, ha='right')
+
+    plt.tight_layout()
 
-        plt.tight_layout()
+    # Save figure. tight_layout() has already fitted the axes, so we skip
+    # bbox_inches='tight' and the extra draw pass it would trigger.
+    try:
+        return _write_output(
+            lambda f: _save_figure(fig, f, output_format),
+            output_filename, output_format, output_buffer, chart_type
+        )
+    finally:
+        plt.close(fig)
 
-        # Save figure
-        output_path = Config.OUTPUT_DIR / output_filename
-        plt.savefig(output_path, dpi=100, bbox_inches='tight')
-        plt.close()
 
+def _bucket_categories(df: pd.DataFrame, x_column: str, y_columns: list, max_categories: int) -> pd.DataFrame:
+    """
+    Average the y columns per category, keep the top max_categories
+    categories by the first y column and average the remaining rows into a
+    single "Other" row. Categories keep their order of first appearance.
+    """
+    if not max_categories:
+        return df
+
+    grouped = df.groupby(x_column, observed=True, sort=False)[list(y_columns)].mean().reset_index()
+    if len(grouped) <= max_categories:
+        grouped[x_column] = _category_labels(grouped[x_column])
+        return grouped
+
+    keep_idx = np.argpartition(-grouped[y_columns[0]].fillna(-np.inf).to_numpy(), max_categories - 1)[:max_categories]
+    keep_mask = np.zeros(len(grouped), dtype=bool)
+    keep_mask[keep_idx] = True
+
+    kept = grouped.loc[keep_mask].copy()
+    kept[x_column] = _category_labels(kept[x_column])
+    rest = df.loc[~df[x_column].isin(grouped.loc[keep_mask, x_column]), y_columns]
+
+    other = pd.DataFrame({x_column: [f"Other ({len(grouped) - max_categories})"], **{c: [rest[c].mean()] for c in y_columns}})
+    return pd.concat([kept, other], ignore_index=True)
+
+
+def _category_labels(values: pd.Series) -> pd.Series:
+    """Render x values as tick label strings"""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.dt.strftime('%Y-%m-%d')
+    return values.astype(str)
+
+
+def _draw_bar_collection(ax, df: pd.DataFrame, x_column: str, y_columns: list):
+    """
+    Draw grouped bars for every series as a single PolyCollection.
+
+    Bar geometry is computed with NumPy broadcasting rather than one
+    plt.bar call per series, and tick labels are thinned to at most
+    Config.MAX_BAR_TICKS so dense category axes stay readable.
+    """
+    n_rows, n_series = len(df), len(y_columns)
+    width = 0.8 / n_series
+
+    # Left edge of every bar, shape (n_series, n_rows)
+    x_pos = np.arange(n_rows)
+    offsets = (np.arange(n_series) - n_series / 2) * width
+    left = x_pos[np.newaxis, :] + offsets[:, np.newaxis]
+    right = left + width
+    heights = df[y_columns].to_numpy(dtype=float).T
+    heights = np.nan_to_num(heights)
+    zeros = np.zeros_like(heights)
+
+    # One rectangle (4 vertices) per bar, shape (n_series * n_rows, 4, 2)
+    verts = np.stack([
+        np.stack([left, zeros], axis=-1),
+        np.stack([left, heights], axis=-1),
+        np.stack([right, heights], axis=-1),
+        np.stack([right, zeros], axis=-1),
+    ], axis=2).reshape(-1, 4, 2)
+
+    colors = plt.rcParams['axes.prop_cycle'].by_key()['color']
+    series_colors = [colors[i % len(colors)] for i in range(n_series)]
+    facecolors = np.repeat(to_rgba_array(series_colors), n_rows, axis=0)
+
+    ax.add_collection(PolyCollection(verts, facecolors=facecolors, edgecolors='none'))
+    ax.set_xlim(-0.5, n_rows - 0.5)
+    y_low, y_high = min(0.0, heights.min()), max(0.0, heights.max())
+    pad = (y_high - y_low) * 0.05 or 1.0
+    # All-zero (or all-NaN) data still gets a non-degenerate axis
+    y_top = y_high + pad if y_high > 0 else (0.0 if y_low < 0 else pad)
+    ax.set_ylim(y_low - pad if y_low < 0 else 0.0, y_top)
+
+    # Tick thinning
+    step = max(1, int(np.ceil(n_rows / Config.MAX_BAR_TICKS)))
+    labels = _category_labels(df[x_column]).to_numpy()
+    ax.set_xticks(x_pos[::step])
+    ax.set_xticklabels(labels[::step])
+
+    # loc='best' scans every bar for overlap, which is slow on dense charts
+    ax.legend(
+        handles=[Patch(color=c, label=y_col) for c, y_col in zip(series_colors, y_columns)],
+        loc='best' if n_rows <= Config.MAX_BAR_TICKS else 'upper right'
+    )
+
+
+def _build_series_spec(df: pd.DataFrame, x_column: str, y_columns: list, chart_type: str, title: str) -> dict:
+    """Build a JSON-serializable series spec for client-side rendering"""
+    x_values = df[x_column]
+    if pd.api.types.is_datetime64_any_dtype(x_values):
+        x_values = x_values.dt.strftime('%Y-%m-%d')
+
+    def to_list(series):
+        # float32 -> shortest decimal repr (34.62, not 34.619998931884766)
+        if series.dtype == np.float32:
+            series = series.astype(str).astype(float)
+        # NaN is not valid JSON, emit null instead
+        return series.astype(object).where(series.notna(), None).tolist()
+
+    return {
+        "chart_type": chart_type,
+        "title": title,
+        "x": {"name": x_column, "values": to_list(x_values)},
+        "series": [{"name": y_col, "values": to_list(df[y_col])} for y_col in y_columns]
+    }
+
+
+def _save_figure(fig, f, output_format: str):
+    """Write a rendered figure to a binary file object"""
+    if output_format == "png":
+        fig.savefig(
+            f, format='png', dpi=Config.CHART_DPI,
+            pil_kwargs={'compress_level': Config.PNG_COMPRESS_LEVEL}
+        )
+    else:
+        fig.savefig(f, format=output_format)
+
+
+def _write_output(writer, output_filename: str, output_format: str, output_buffer, chart_type: str) -> dict:
+    """Run writer against the caller's buffer or a file in Config.OUTPUT_DIR"""
+    if output_buffer is not None:
+        writer(output_buffer)
         return {
             "success": True,
-            "message": f"Visualization created successfully. Saved to {output_filename}",
-            "file_path": str(output_path),
-            "chart_type": chart_type
+            "message": f"Visualization created successfully ({output_format}, written to buffer)",
+            "file_path": None,
+            "chart_type": chart_type,
+            "output_format": output_format
         }
 
-    except Exception as e:
-        return {
-            "success": False,
-            "message": f"Error creating visualization: {str(e)}",
-            "file_path": None
-        }
+    output_filename = str(Path(output_filename).with_suffix(OUTPUT_FORMATS[output_format]))
+    output_path = Config.OUTPUT_DIR / output_filename
+    with open(output_path, 'wb') as f:
+        writer(f)
+
+    return {
+        "success": True,
+        "message": f"Visualization created successfully. Saved to {output_filename}",
+        "file_path": str(output_path),
+        "chart_type": chart_type,
+        "output_format": output_format
+    }
 
 
 # Test function
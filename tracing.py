@@ -0,0 +1,184 @@
+"""
+Tracing and metrics for Weather Data Agent
+Records timed spans for each stage of the agent loop and exports them as
+JSON lines and Prometheus text format
+"""
+
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+from config import Config
+
+# Histogram bucket upper bounds (seconds) for span durations
+DURATION_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0]
+
+# Numeric span attributes that are summed into per-span counters
+COUNTER_ATTRIBUTES = ['bytes_processed', 'rows_returned']
+
+METRIC_PREFIX = 'weather_agent'
+
+
+class Span:
+    """A single timed operation with attributes"""
+
+    def __init__(self, name: str, trace_id: str, parent_id: str = None, attributes: dict = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.status = "ok"
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.duration = None
+
+    def set_attribute(self, key: str, value):
+        """Attach an attribute; None values are dropped"""
+        if value is not None:
+            self.attributes[key] = value
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "duration": self.duration,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class Tracer:
+    """
+    Collects spans and aggregates them into metrics.
+
+    Spans nest per thread: a span opened inside another span on the same
+    thread becomes its child and shares its trace_id.
+    """
+
+    def __init__(self, max_spans: int = None, export_path: str = None):
+        self.spans = deque(maxlen=max_spans or Config.TRACE_MAX_SPANS)
+        self.export_path = export_path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._histograms = {}  # span name -> {"buckets": [...], "sum": float, "count": int}
+        self._counters = {}    # (metric, span name) -> value
+        self._errors = {}      # span name -> count
+
+    def _stack(self) -> list:
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def current_span(self) -> Span:
+        """The innermost open span on this thread, if any"""
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """
+        Time the enclosed block as a span
+
+        Usage:
+            with tracer.span("bigquery.job", sql_length=len(sql)) as span:
+                ...
+                span.set_attribute("bytes_processed", job.total_bytes_processed)
+        """
+        parent = self.current_span()
+        span = Span(
+            name,
+            trace_id=parent.trace_id if parent else uuid.uuid4().hex,
+            parent_id=parent.span_id if parent else None,
+            attributes=attributes
+        )
+        stack = self._stack()
+        stack.append(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.set_attribute("error", type(e).__name__)
+            raise
+        finally:
+            span.duration = time.perf_counter() - span._start
+            stack.pop()
+            self._finish(span)
+
+    def _finish(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+            histogram = self._histograms.setdefault(
+                span.name, {"buckets": [0] * len(DURATION_BUCKETS), "sum": 0.0, "count": 0}
+            )
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if span.duration <= bound:
+                    histogram["buckets"][i] += 1
+            histogram["sum"] += span.duration
+            histogram["count"] += 1
+
+            for attribute in COUNTER_ATTRIBUTES:
+                value = span.attributes.get(attribute)
+                if isinstance(value, (int, float)):
+                    key = (attribute, span.name)
+                    self._counters[key] = self._counters.get(key, 0) + value
+
+            if span.status == "error":
+                self._errors[span.name] = self._errors.get(span.name, 0) + 1
+
+            if self.export_path:
+                with open(self.export_path, 'a') as f:
+                    f.write(json.dumps(span.to_dict(), default=str) + "\n")
+
+    def prometheus_text(self) -> str:
+        """Render aggregated metrics in Prometheus text exposition format"""
+        with self._lock:
+            lines = [
+                f"# HELP {METRIC_PREFIX}_span_duration_seconds Duration of traced agent stages",
+                f"# TYPE {METRIC_PREFIX}_span_duration_seconds histogram",
+            ]
+            for name, histogram in sorted(self._histograms.items()):
+                for bound, count in zip(DURATION_BUCKETS, histogram["buckets"]):
+                    lines.append(f'{METRIC_PREFIX}_span_duration_seconds_bucket{{span="{name}",le="{bound}"}} {count}')
+                lines.append(f'{METRIC_PREFIX}_span_duration_seconds_bucket{{span="{name}",le="+Inf"}} {histogram["count"]}')
+                lines.append(f'{METRIC_PREFIX}_span_duration_seconds_sum{{span="{name}"}} {histogram["sum"]}')
+                lines.append(f'{METRIC_PREFIX}_span_duration_seconds_count{{span="{name}"}} {histogram["count"]}')
+
+            for attribute in COUNTER_ATTRIBUTES:
+                metric = f"{METRIC_PREFIX}_{attribute}_total"
+                lines.append(f"# TYPE {metric} counter")
+                for (counter_attribute, name), value in sorted(self._counters.items()):
+                    if counter_attribute == attribute:
+                        lines.append(f'{metric}{{span="{name}"}} {value}')
+
+            lines.append(f"# TYPE {METRIC_PREFIX}_span_errors_total counter")
+            for name, count in sorted(self._errors.items()):
+                lines.append(f'{METRIC_PREFIX}_span_errors_total{{span="{name}"}} {count}')
+
+        return "\n".join(lines) + "\n"
+
+    def write_metrics(self, path=None):
+        """Write Prometheus text metrics to path (default Config.METRICS_EXPORT_PATH)"""
+        path = path or Config.METRICS_EXPORT_PATH
+        if path:
+            with open(path, 'w') as f:
+                f.write(self.prometheus_text())
+
+    def reset(self):
+        """Drop all recorded spans and metrics"""
+        with self._lock:
+            self.spans.clear()
+            self._histograms.clear()
+            self._counters.clear()
+            self._errors.clear()
+
+
+# Process-wide tracer used by the orchestrator and tools
+tracer = Tracer(export_path=Config.TRACE_EXPORT_PATH)